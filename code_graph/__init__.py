@@ -1,9 +1,11 @@
-import code_tokenize as ctok
+import os
+
+from functools import partial, lru_cache
 
 from .graph import CodeGraph
 
-from .pylang   import pylang_analyses
-from .javalang import javalang_analyses, java_preprocess
+# Note: code_tokenize, the language specific analyses and the process pool
+# are imported lazily (on first use) since importing them is expensive.
 
 
 DEFAULT_ANALYSES = ["ast", "cfg", "dataflow"]
@@ -80,21 +82,83 @@ def codegraph(source_code, lang = "guess", analyses = None, **kwargs):
     return graph
 
 
+def codegraph_many(source_codes, lang = "guess", analyses = None, workers = None, **kwargs):
+    """
+    Transforms a collection of source codes into annotated ASTs in parallel.
+
+    Each source code is parsed independently in a pool of worker processes.
+    Since tree-sitter nodes cannot be shared between processes, the returned
+    graphs are detached from the AST (syntax nodes have no ast_node attached).
+    All other parameters are the same as for codegraph.
+
+    Parameters
+    ----------
+    source_codes : list of str
+        Source codes to be parsed
+
+    workers : int
+        Number of worker processes.
+        Default: os.cpu_count()
+
+    Returns
+    -------
+    list of SourceCodeGraph
+        A code graph for each source code (in the same order)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    source_codes = list(source_codes)
+    if len(source_codes) == 0: return []
+
+    if workers is None: workers = os.cpu_count() or 1
+    chunksize = max(1, len(source_codes) // (4 * workers))
+
+    parse_fn = partial(codegraph, lang = lang, analyses = analyses, **kwargs)
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        return list(executor.map(parse_fn, source_codes, chunksize = chunksize))
+
+
+async def codegraph_async(source_code, lang = "guess", analyses = None, executor = None, **kwargs):
+    """
+    Asynchronous version of codegraph.
+
+    The source code is parsed in the given executor
+    (default: the executor of the running event loop).
+    See codegraph for all further parameters.
+    """
+    import asyncio
+
+    loop     = asyncio.get_running_loop()
+    parse_fn = partial(codegraph, source_code, lang = lang, analyses = analyses, **kwargs)
+    return await loop.run_in_executor(executor, parse_fn)
+
+
+@lru_cache(maxsize = None)
 def load_lang_analyses(lang):
-    if lang == 'python': return pylang_analyses()
-    if lang == 'java'  : return javalang_analyses()
+    if lang == 'python':
+        from .pylang import pylang_analyses
+        return pylang_analyses()
+
+    if lang == 'java':
+        from .javalang import javalang_analyses
+        return javalang_analyses()
 
     raise NotImplementedError("Language %s is not supported" % lang)
 
 
 def preprocess_code(source_code, lang, **kwargs):
 
-    if lang == "java": return java_preprocess(source_code, **kwargs)
+    if lang == "java":
+        from .javalang import java_preprocess
+        return java_preprocess(source_code, **kwargs)
 
     return default_preprocess(source_code, lang, **kwargs)
 
 
 def default_preprocess(source_code, lang, **kwargs):
+    import code_tokenize as ctok
+
     tokens = ctok.tokenize(source_code, lang = lang, **kwargs)
     root_node = _root_node(tokens)
     return root_node, tokens 
@@ -112,8 +176,10 @@ def _root_node(tokens):
 
     current_ast = base_token.ast_node 
     
-    while current_ast.parent is not None:
-        current_ast = current_ast.parent
+    # Every parent access is a call into tree-sitter
+    parent = current_ast.parent
+    while parent is not None:
+        current_ast, parent = parent, parent.parent
 
     # If root only has one child skip to child
     if current_ast.child_count == 1:
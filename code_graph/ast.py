@@ -1,5 +1,7 @@
 from .visitor import ASTVisitor
 
+from .graph import EDGE_CHILD, EDGE_SIBLING
+
 
 class ASTRelationVisitor(ASTVisitor):
 
@@ -8,12 +10,48 @@ class ASTRelationVisitor(ASTVisitor):
         self.graph = graph
 
     def visit(self, ast_node):
-        graph = self.graph
+        self._add_relations(ast_node, ast_node.prev_sibling)
+
+    def _add_relations(self, ast_node, prev_sibling):
+        graph    = self.graph
+        children = ast_node.children
 
         if not graph.is_token(ast_node):
-            for child in ast_node.children:
-                graph.add_relation(ast_node, child, "child")
-        
-        prev_sibling = ast_node.prev_sibling
+            for child in children:
+                graph.add_relation(ast_node, child, EDGE_CHILD)
+
         if prev_sibling is not None:
-            graph.add_relation(prev_sibling, ast_node, "sibling", no_create=True)
\ No newline at end of file
+            graph.add_relation(prev_sibling, ast_node, EDGE_SIBLING, no_create=True)
+
+        return children
+
+    # Navigation ------------------------------------------------
+
+    def walk(self, root_node):
+        # Same walk as ASTVisitor.walk, but each node is kept on the stack
+        # together with its previous sibling. The siblings are read from the
+        # children of the parent since every prev_sibling access is a call
+        # into tree-sitter. Nodes are not used as dict keys since they are
+        # not hashable in all tree-sitter versions.
+        if root_node is None: return
+
+        visit_table = self._visit_table
+
+        stack = [(root_node, root_node.prev_sibling)]
+        while len(stack) > 0:
+            current_node, prev_sibling = stack.pop()
+
+            visitor_fn = visit_table.get(current_node.type, None)
+            if visitor_fn is None:
+                children = self._add_relations(current_node, prev_sibling)
+            elif visitor_fn(self, current_node) is not False:
+                children = current_node.children
+            else:
+                continue
+
+            pending, prev_child = [], None
+            for child in children:
+                pending.append((child, prev_child))
+                prev_child = child
+
+            stack.extend(reversed(pending))
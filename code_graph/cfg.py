@@ -0,0 +1,7 @@
+# Helpers shared by the control flow analyses.
+
+
+def is_statement_type(node_type):
+    # All statement node types end with statement in tree-sitter.
+    # Therefore, we can safely do this hack.
+    return node_type.endswith("statement")
@@ -0,0 +1,185 @@
+from .visitor import ASTVisitor
+
+from .flows import merge_rw_contexts, _EMPTY_CTX
+
+
+# Identifier context --------------------------------
+
+class _context:
+    # A plain context manager class is cheaper to enter
+    # than a generator based one (with _context(self, ...))
+
+    __slots__ = ("visitor", "identifier_ctx", "outer_ctx")
+
+    def __init__(self, visitor, identifier_ctx):
+        self.visitor        = visitor
+        self.identifier_ctx = identifier_ctx
+
+    def __enter__(self):
+        self.outer_ctx = getattr(self.visitor, '_id_context', None)
+        self.visitor._id_context = self.identifier_ctx
+
+    def __exit__(self, *exc_info):
+        self.visitor._id_context = self.outer_ctx
+
+def context(identifier_ctx):
+
+    def visitor_decorator(visitor_fn):
+        
+        def contextual_visitor(self, node):
+            with _context(self, identifier_ctx):
+                return visitor_fn(self, node)
+        
+        return contextual_visitor
+
+    return visitor_decorator
+
+
+def current_context(self):
+    return getattr(self, '_id_context', None)
+
+# Base visitor ----------------------------------------
+
+class BaseDataFlowVisitor(ASTVisitor):
+    # Language independent part of the dataflow analyses (scopes and read / write contexts).
+    # Subclasses record reads and writes (see record_read and record_write).
+
+    def __init__(self, graph):
+        super().__init__()
+        self.graph = graph
+
+        self._last_writes = {}
+        self._last_reads  = {}
+        self._rw_shared   = False
+
+        self._returns_from_rw  = []
+        self._continue_from_rw = []
+        self._break_from_rw    = []
+
+        # Variables registered per scope (indexed by the qualified scope name).
+        # Each scope maps its variables to their qualified names.
+        # A registered scope implies that all of its parents are registered.
+        self._var_scopes    = {}
+        self._scope_prefix  = ["G"] # Qualified names of the currently open scopes
+        self._qualname_cache = {}   # Resolved names in the current scope (see qualname)
+
+    # Scope handling ----------------------------------------------------
+    
+    def register_in_scope(self, var_name):
+        var_scopes = self._var_scopes
+        scope      = self._scope_prefix[-1]
+
+        if scope not in var_scopes:
+            for parent_scope in reversed(self._scope_prefix):
+                if parent_scope in var_scopes: break
+                var_scopes[parent_scope] = {}
+
+        scope_vars = var_scopes[scope]
+        qname = scope_vars.get(var_name, None)
+        if qname is None:
+            qname = scope_vars[var_name] = scope + "." + var_name
+            self._qualname_cache.clear()
+        return qname
+    
+    def qualname(self, var_name):
+        # The variable is resolved to the innermost registered scope that defines it.
+        # Undefined variables are associated with the outermost scope.
+        # Resolutions are cached until the scopes or their variables change.
+        qualname_cache = self._qualname_cache
+        qname = qualname_cache.get(var_name, None)
+        if qname is not None: return qname
+
+        qname = qualname_cache[var_name] = self._resolve_qualname(var_name)
+        return qname
+
+    def _resolve_qualname(self, var_name):
+        var_scopes   = self._var_scopes
+        scope_prefix = self._scope_prefix
+
+        depth = len(scope_prefix)
+        while depth > 0 and scope_prefix[depth - 1] not in var_scopes: depth -= 1
+        if depth == 0: return var_name
+
+        for scope in scope_prefix[depth - 1:0:-1]:
+            qname = var_scopes[scope].get(var_name, None)
+            if qname is not None: return qname
+
+        # The outermost scope is never searched above. Storing the name there
+        # only ensures that each qualified name is built once.
+        global_vars = var_scopes[scope_prefix[0]]
+        qname = global_vars.get(var_name, None)
+        if qname is None:
+            qname = global_vars[var_name] = scope_prefix[0] + "." + var_name
+        return qname
+
+    def _enter_scope(self, scope):
+        self._scope_prefix.append(self._scope_prefix[-1] + "." + scope)
+        self._qualname_cache.clear()
+
+    def _leave_scope(self):
+        self._scope_prefix.pop(-1)
+        self._qualname_cache.clear()
+
+    # Variable reads / writes ------------------------------------------
+
+    def record_write(self, node):
+        """
+        Records a write to the given identifier
+
+        Override this to link the identifier to the current read / write context.
+        """
+
+    def record_read(self, node):
+        """
+        Records a read of the given identifier
+
+        Override this to link the identifier to the current read / write context.
+        """
+
+    def visit_identifier(self, node):
+        node_context = current_context(self)
+        if node_context is None  :  return self.record_read(node) # Default to read variable
+        if node_context == "read":  return self.record_read(node)
+        if node_context == "write": return self.record_write(node)
+
+    # Read / Write handler ------------------------------------------
+    
+    def _copy_rw_context(self):
+        # Copy on write: the current context is shared with the snapshot
+        # and only copied before it is modified next (see _own_rw_context)
+        self._rw_shared = True
+        return (self._last_reads, self._last_writes)
+
+    def _own_rw_context(self):
+        self._last_reads  = self._last_reads.copy()
+        self._last_writes = self._last_writes.copy()
+        self._rw_shared   = False
+
+    def _restore_rw_context(self, rw_context):
+        rcontext, wcontext = rw_context
+        self._last_reads, after_rcontext  = rcontext, self._last_reads
+        self._last_writes, after_wcontext = wcontext, self._last_writes
+        # The snapshot might still be shared with an outer snapshot
+        self._rw_shared = True
+
+        return (after_rcontext, after_wcontext)
+
+    def _join_rw_context(self, rw_context):
+        if rw_context is _EMPTY_CTX: return
+
+        # Joining with an empty context or the current context itself
+        # (e.g. a branch that recorded nothing) does not change the flows
+        rcontext, wcontext = rw_context
+        if not rcontext and not wcontext: return
+        if rcontext is self._last_reads and wcontext is self._last_writes: return
+
+        self._last_reads, self._last_writes = merge_rw_contexts(
+            (self._last_reads, self._last_writes),
+            rw_context
+        )
+        self._rw_shared = False
+
+    def _reset_rw_context(self):
+        self._last_reads = {}
+        self._last_writes = {}
+        self._rw_shared = False
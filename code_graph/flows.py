@@ -0,0 +1,53 @@
+# Read / write flows shared by the dataflow analyses.
+# A flow maps a (qualified) variable name to the nodes (a tuple without duplicates)
+# that last read or wrote the variable. Most flows only contain a single node.
+# Tuples are much smaller than sets for this case.
+# Flows are plain dicts: a variable without an entry has no nodes.
+# This module can be compiled with mypyc (see setup.py).
+
+# An empty read / write context. Shared by all jumps (break, continue, return)
+# that did not occur yet. Like all contexts, it is never modified in place.
+_EMPTY_CTX: tuple = ({}, {})
+
+
+def merge_flows(source_flow: dict, target_flow: dict) -> dict:
+    # The smaller flow is merged into a copy of the larger one.
+    # Node tuples are immutable. Therefore, they can be shared.
+    if len(source_flow) < len(target_flow):
+        source_flow, target_flow = target_flow, source_flow
+
+    result: dict = source_flow.copy()
+
+    for v, target_nodes in target_flow.items():
+        source_nodes = result.get(v, None)
+        if source_nodes is None or len(source_nodes) == 0:
+            result[v] = target_nodes
+        elif source_nodes is not target_nodes and len(target_nodes) > 0:
+            result[v] = _union(source_nodes, target_nodes)
+
+    return result
+
+
+def _union(source_nodes: tuple, target_nodes: tuple) -> tuple:
+    # Node tuples are usually short. Only larger tuples are indexed by a set.
+    if len(source_nodes) <= 8:
+        new_nodes = tuple(n for n in target_nodes if n not in source_nodes)
+    else:
+        contained = set(source_nodes)
+        new_nodes = tuple(n for n in target_nodes if n not in contained)
+
+    if len(new_nodes) == 0: return source_nodes
+    return source_nodes + new_nodes
+
+
+def merge_rw_contexts(source_rw_contex: tuple, target_rw_contex: tuple) -> tuple:
+    if source_rw_contex is _EMPTY_CTX: return target_rw_contex
+    if target_rw_contex is _EMPTY_CTX: return source_rw_contex
+
+    source_rcontext, source_wcontext = source_rw_contex
+    target_rcontext, target_wcontext = target_rw_contex
+
+    result_rcontext = merge_flows(source_rcontext, target_rcontext)
+    result_wcontext = merge_flows(source_wcontext, target_wcontext)
+
+    return (result_rcontext, result_wcontext)
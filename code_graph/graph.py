@@ -1,33 +1,78 @@
+import sys
+
 from io import StringIO
-from collections import defaultdict
+from array import array
+from itertools import accumulate
+
 
-from code_tokenize.tokens import Token
+# Edge types --------------------------------------------------------
+# Edge types are used as dictionary keys for every edge. Interned constants
+# guarantee that keys can be compared by identity.
+
+EDGE_AST            = sys.intern("ast")
+EDGE_CHILD          = sys.intern("child")
+EDGE_SIBLING        = sys.intern("sibling")
+EDGE_NEXT_TOKEN     = sys.intern("next_token")
+EDGE_CONTROLFLOW    = sys.intern("controlflow")
+EDGE_RETURN_FROM    = sys.intern("return_from")
+EDGE_YIELD_FROM     = sys.intern("yield_from")
+EDGE_ASSIGNED_FROM  = sys.intern("assigned_from")
+EDGE_OCCURRENCE_OF  = sys.intern("occurrence_of")
+EDGE_NEXT_MAY_USE   = sys.intern("next_may_use")
+EDGE_LAST_MAY_WRITE = sys.intern("last_may_write")
 
 
 class CodeGraph:
 
-    def __init__(self, root_node, tokens, lang = "python"):
+    def __init__(self, root_node = None, tokens = None, lang = "python", token_nodes = None) -> None:
+        # Without arguments, an empty graph is created (e.g. while unpickling).
+        # Compiled graphs (see setup.py) can only be unpickled this way.
+        if tokens is None: tokens = []
 
         self.tokens = tokens
         self.root_node = root_node
         self.lang = lang
 
-        self.__nodes     = [] # General container for all nodes
-        self.__ast_nodes = {} # Nodes indexed by AST
+        self.__nodes: list     = [] # General container for all nodes
+        self.__ast_nodes: dict = {} # Nodes indexed by AST
 
         # Init graph
-        self.token_nodes = []
-
-        prev_token = self._add_token(tokens[0])
-        self.token_nodes.append(prev_token)
+        # Token nodes can be given (e.g. cloned from another graph) to avoid recomputing them
+        if token_nodes is None:
+            token_nodes = [TokenNode(token) for token in tokens]
 
-        for token in tokens[1:]:
-            token_node = self._add_token(token)
-            prev_token.add_successor(token_node, "next_token")
-            prev_token = token_node
-            self.token_nodes.append(token_node)
+        self.token_nodes = self._add_token_nodes(token_nodes)
         
-        self.root_node = self.add_node(root_node)
+        if root_node is not None: self.root_node = self.add_node(root_node)
+
+    def _add_token_nodes(self, token_nodes):
+        # Bulk version of _add_node for fresh token nodes which links them by next_token edges
+        nodes, ast_nodes = self.__nodes, self.__ast_nodes
+        added_nodes = []
+
+        for token_node in token_nodes:
+            ast_key = token_node._key
+            if ast_key is not None:
+                graph_node = ast_nodes.get(ast_key)
+                if graph_node is not None:
+                    added_nodes.append(graph_node)
+                    continue
+                ast_nodes[ast_key] = token_node
+
+            token_node._graph_idx = len(nodes)
+            nodes.append(token_node)
+            added_nodes.append(token_node)
+
+        if len(nodes) == len(added_nodes):
+            # All token nodes are new. Therefore, we can set the edges directly.
+            for prev_token, token_node in zip(added_nodes, added_nodes[1:]):
+                prev_token._successors[EDGE_NEXT_TOKEN]  = [token_node]
+                token_node._predecessors[EDGE_NEXT_TOKEN] = [prev_token]
+        else:
+            for prev_token, token_node in zip(added_nodes, added_nodes[1:]):
+                prev_token.add_successor(token_node, EDGE_NEXT_TOKEN)
+
+        return added_nodes
 
     # Add nodes ----------------------------------------------------------------
 
@@ -39,8 +84,8 @@ class CodeGraph:
             assert self.__nodes[graph_idx] == node, "Node is already assigned to another graph"
             return node
 
-        if hasattr(node, "ast_node") and node.ast_node is not None:
-            ast_key = node_key(node.ast_node)
+        ast_key = getattr(node, "_key", None)
+        if ast_key is not None:
             try:
                 return self.__ast_nodes[ast_key]
             except KeyError:
@@ -51,19 +96,36 @@ class CodeGraph:
         return node
 
     def _add_ast_node(self, ast_node):
-        return self._add_node(SyntaxNode(ast_node))
+        # Only create a new node if the AST node is not part of the graph yet
+        ast_key = node_key(ast_node)
+        graph_node = self.__ast_nodes.get(ast_key, None)
+        if graph_node is not None: return graph_node
+        return self._add_node(SyntaxNode(ast_node, ast_key))
 
     def _add_token(self, token):
-        return self._add_node(TokenNode(token))
+        # Only create a new node if the token is not part of the graph yet
+        ast_node = getattr(token, "ast_node", None)
+        if ast_node is None: return self._add_node(TokenNode(token))
+
+        ast_key = node_key(ast_node)
+        graph_node = self.__ast_nodes.get(ast_key, None)
+        if graph_node is not None: return graph_node
+        return self._add_node(TokenNode(token, ast_key))
+
+    def _add_symbol(self, symbol):
+        return self._add_node(SymbolNode(symbol))
 
     def add_node(self, node):
-        if isinstance(node, Node): return self._add_node(node)
-        if isinstance(node, Token): return self._add_token(node)
-        if isinstance(node, str): return self._add_node(SymbolNode(node))
+        # Dispatch by type (resolved once per type)
+        node_type = type(node)
+        try:
+            add_fn = _ADD_NODE_DISPATCH[node_type]
+        except KeyError:
+            add_fn = _resolve_add_node(node_type)
 
-        return self._add_ast_node(node)
+        return add_fn(self, node)
 
-    def add_relation(self, source_node, target_node, relation = "ast", no_create = False):
+    def add_relation(self, source_node, target_node, relation = EDGE_AST, no_create = False):
 
         if no_create:
             if not self.has_node(source_node): return
@@ -73,24 +135,112 @@ class CodeGraph:
         target_node = self.add_node(target_node)
         source_node.add_successor(target_node, relation)
 
+    def add_edges_from(self, source_nodes, target_node, relation = EDGE_AST):
+        """Adds a relation from each of the source nodes to the same target node"""
+        target = None
+
+        for source_node in source_nodes:
+            # The target is only resolved once (and only if there is any source)
+            if target is None: target = self.add_node(target_node)
+            self.add_node(source_node).add_successor(target, relation)
+
     # API GET methods-----------------------------------------
 
     def has_node(self, ast_node):
         try:
             return self.__nodes[ast_node._graph_idx] == ast_node
         except (IndexError, AttributeError):
+            if isinstance(ast_node, Node):
+                return getattr(ast_node, "_key", None) in self.__ast_nodes
             return node_key(ast_node) in self.__ast_nodes
 
     def node_by_ast(self, ast_node):
-        if not self.has_node(ast_node): return None
-        return self.__ast_nodes[node_key(ast_node)]
+        return self.__ast_nodes.get(node_key(ast_node), None)
 
     def is_token(self, ast_node):
-        return hasattr(self.node_by_ast(ast_node), "token")
+        return isinstance(self.node_by_ast(ast_node), TokenNode)
 
     def nodes(self):
         return self.__nodes
 
+    def edge_arrays(self):
+        """
+        Returns all edges of the graph as parallel arrays
+
+        Edge i connects the node sources[i] with the node targets[i]
+        (both given by their index in the graph). Its edge type is
+        edge_type_names[edge_types[i]]. Edges are ordered by their source node.
+
+        Returns
+        -------
+        tuple of (array, array, array, list)
+            sources, targets, edge_types and edge_type_names
+        """
+        nodes     = self.__nodes
+        num_nodes = len(nodes)
+
+        sources, targets, edge_types = array("i"), array("i"), array("H")
+        type_ids = {}
+
+        for node in nodes:
+            source_idx = node._graph_idx
+
+            for edge_type, successors in node._successors.items():
+                type_id = type_ids.get(edge_type)
+                if type_id is None: type_id = type_ids[edge_type] = len(type_ids)
+
+                for successor in successors:
+                    # Skip edges to nodes outside of this graph
+                    target_idx = getattr(successor, "_graph_idx", -1)
+                    if target_idx >= num_nodes or nodes[target_idx] is not successor: continue
+
+                    sources.append(source_idx)
+                    targets.append(target_idx)
+                    edge_types.append(type_id)
+
+        return sources, targets, edge_types, list(type_ids)
+
+    def freeze(self):
+        """
+        Returns a read-only CSR view of the edges in the graph
+
+        The view is a snapshot. Later changes to the graph are not reflected.
+        """
+        sources, targets, edge_types, edge_type_names = self.edge_arrays()
+
+        # Edges are already ordered by their source node
+        counts = [0] * (len(self) + 1)
+        for source_idx in sources: counts[source_idx + 1] += 1
+
+        return CSRView(array("i", accumulate(counts)), targets, edge_types, edge_type_names)
+
+    def to_csr(self):
+        """
+        Returns the edges of the graph in compressed sparse row (CSR) format
+
+        The successors of node i are indices[indptr[i]:indptr[i + 1]]
+        and the corresponding edge types are edge_types[indptr[i]:indptr[i + 1]].
+        Requires numpy.
+
+        Returns
+        -------
+        tuple of (ndarray, ndarray, ndarray, list)
+            indptr, indices and edge_types (int32) and edge_type_names
+        """
+        import numpy as np
+
+        sources, targets, edge_types, edge_type_names = self.edge_arrays()
+
+        # Edges are already ordered by their source node
+        sources = np.frombuffer(sources, dtype = np.intc)
+        indptr  = np.zeros(len(self) + 1, dtype = np.int32)
+        np.cumsum(np.bincount(sources, minlength = len(self)), out = indptr[1:])
+
+        indices    = np.frombuffer(targets, dtype = np.intc).astype(np.int32)
+        edge_types = np.frombuffer(edge_types, dtype = np.uint16).astype(np.int32)
+
+        return indptr, indices, edge_types, edge_type_names
+
     def todot(self, file_name = None, edge_colors = None):
         dotwriter = GraphToDot(self, edge_colors)
 
@@ -114,13 +264,51 @@ class CodeGraph:
         return graph_to_tokens_only(self)
          
       
+    # Pickle support -----------------------------------------
+
+    def __getstate__(self):
+        # Tree-sitter nodes cannot be pickled. Therefore, we only store
+        # the nodes (detached from the AST) and the edges as index arrays.
+        # This also avoids deep recursion while pickling long node chains.
+        # Empty graphs (see __init__) have no root.
+        root_node = self.root_node
+        return {
+            "lang"       : self.lang,
+            "nodes"      : self.__nodes,
+            "edges"      : self.edge_arrays(),
+            "token_nodes": [node._graph_idx for node in self.token_nodes],
+            "root_node"  : root_node._graph_idx if root_node is not None else None,
+        }
+
+    def __setstate__(self, state):
+        nodes = state["nodes"]
+
+        self.lang        = state["lang"]
+        self.__nodes     = nodes
+        self.__ast_nodes = {}
+
+        for node in nodes:
+            ast_key = getattr(node, "_key", None)
+            if ast_key is not None: self.__ast_nodes.setdefault(ast_key, node)
+
+        sources, targets, edge_types, edge_type_names = state["edges"]
+        edge_type_names = [sys.intern(edge_type) for edge_type in edge_type_names]
+
+        for source_idx, target_idx, type_id in zip(sources, targets, edge_types):
+            nodes[source_idx].add_successor(nodes[target_idx], edge_type_names[type_id])
+
+        self.token_nodes = [nodes[idx] for idx in state["token_nodes"]]
+        self.tokens      = [node.token for node in self.token_nodes]
+        root_idx         = state["root_node"]
+        self.root_node   = nodes[root_idx] if root_idx is not None else None
+
     # Internal GET methods -----------------------------------
 
     def __len__(self):
         return len(self.__nodes)
 
     def __iter__(self):
-        return iter(self.nodes())
+        return iter(self.__nodes)
 
     def __repr__(self):
         name = self.lang[0].upper() + self.lang[1:]
@@ -130,37 +318,43 @@ class CodeGraph:
 
 # Basic node ------------------------------------
 
+# Successor lists up to this length are scanned for duplicates.
+# Longer lists are indexed by a set (see Node.add_successor).
+_MAX_SCANNED_SUCCESSORS = 16
+
+
 class Node:
+
+    __slots__ = ("_successors", "_predecessors", "_successor_index", "_graph_idx")
+
+    _graph_idx: int # Assigned when the node is added to a graph
     
-    def __init__(self):
-        self._successors   = defaultdict(set)
-        self._predecessors = defaultdict(set)
+    def __init__(self) -> None:
+        # Edges are stored as plain lists per edge type
+        self._successors: dict   = {}
+        self._predecessors: dict = {}
+        # Sets of successors per edge type (only for long successor lists)
+        self._successor_index: dict = {}
 
     # Helper methods --------------------------------
 
-    def _add_predecessor(self, predecessor, edge_type):
-        # This should never be called explicitly
-        self._predecessors[edge_type].add(predecessor)
-
     def _iter_successors(self, edge_type = None):
         if edge_type is None:
-            edge_types = self._successors.keys()
-        else:
-            edge_types = [edge_type]
+            return ((self, edge_type, successor)
+                        for edge_type, successors in self._successors.items()
+                        for successor in successors)
 
-        for edge_type in edge_types:
-            for successor in self._successors[edge_type]:
-                yield self, edge_type, successor
+        return ((self, edge_type, successor) 
+                    for successor in self._successors.get(edge_type, ()))
 
     def _iter_predecessors(self, edge_type = None):
         if edge_type is None:
-            edge_types = self._predecessors.keys()
-        else:
-            edge_types = [edge_type]
+            return ((predecessor, edge_type, self)
+                        for edge_type, predecessors in self._predecessors.items()
+                        for predecessor in predecessors)
 
-        for edge_type in edge_types:
-            for predecessor in self._predecessors[edge_type]:
-                yield predecessor, edge_type, self
+        return ((predecessor, edge_type, self) 
+                    for predecessor in self._predecessors.get(edge_type, ()))
 
     def __repr__(self):
         class_name = self.__class__.__name__
@@ -174,10 +368,29 @@ class Node:
     def node_name(self):
         return "ast"
 
-    def add_successor(self, successor_node, edge_type = "ast"):
+    def add_successor(self, successor_node, edge_type = EDGE_AST):
         if successor_node is None: return
-        self._successors[edge_type].add(successor_node)
-        successor_node._add_predecessor(self, edge_type)
+
+        successors = self._successors.get(edge_type)
+        if successors is None:
+            self._successors[edge_type] = [successor_node]
+        elif len(successors) < _MAX_SCANNED_SUCCESSORS:
+            if successor_node in successors: return # Edge already exists (nodes compare by identity)
+            successors.append(successor_node)
+        else:
+            known_successors = self._successor_index.get(edge_type)
+            if known_successors is None:
+                known_successors = self._successor_index[edge_type] = set(successors)
+            if successor_node in known_successors: return
+            known_successors.add(successor_node)
+            successors.append(successor_node)
+
+        # The edge is new. Therefore, the predecessor list cannot contain it yet.
+        predecessors = successor_node._predecessors.get(edge_type)
+        if predecessors is None:
+            successor_node._predecessors[edge_type] = [self]
+        else:
+            predecessors.append(self)
 
     def num_successors(self):
         return sum(len(succs) for succs in self._successors.values())
@@ -191,6 +404,10 @@ class Node:
     def successors_by_type(self, edge_type):
         return self._iter_successors(edge_type)
 
+    def children_of_type(self, edge_type):
+        # Direct access to the successors of a single edge type
+        return list(self._successors.get(edge_type, ()))
+
     def predecessors(self):
         return self._iter_predecessors()
 
@@ -200,46 +417,82 @@ class Node:
     def clone(self):
         return Node()
 
+    # Pickle support ----------------------------------
+    # Nodes are restored by calling their constructor since compiled
+    # node types (see setup.py) cannot be created otherwise.
+
+    def __reduce__(self):
+        return (self.__class__, self._init_args(), self.__getstate__())
+
+    def _init_args(self):
+        return ()
+
+    def __getstate__(self):
+        # Edges are not pickled together with a node (see CodeGraph)
+        state = {}
+        if hasattr(self, "_graph_idx"): state["_graph_idx"] = self._graph_idx
+        return state
+
+    def __setstate__(self, state):
+        for attr, value in state.items(): setattr(self, attr, value)
+
 # Node types --------------------------------------------------------
 
 class SyntaxNode(Node):
 
-    def __init__(self, ast_node):
+    __slots__ = ("ast_node", "_key", "_hash")
+
+    def __init__(self, ast_node, key = None) -> None:
         super().__init__()
         self.ast_node = ast_node
+        # Computing the key crosses into tree-sitter. Therefore, we only do it once.
+        if key is None and ast_node is not None: key = node_key(ast_node)
+        self._key  = key
+        self._hash = hash(key)
 
     def node_name(self):
-        return self.ast_node.type
+        return self._key[0] # The node type
 
     def clone(self):
-        return SyntaxNode(self.ast_node)
+        return SyntaxNode(self.ast_node, self._key)
 
+    # Equality is identity on purpose: a graph holds exactly one node per key
+    # (see CodeGraph._add_node). Therefore, only the hash has to follow the key.
     def __hash__(self):
-        return hash(node_key(self.ast_node))
+        return self._hash
+
+    def _init_args(self):
+        # Unpickled nodes are detached from the AST.
+        # The hash is recomputed since string hashes differ between processes.
+        return (None, self._key)
 
 
 class TokenNode(SyntaxNode):
 
-    def __init__(self, token):
+    __slots__ = ("token",)
+
+    def __init__(self, token, key = None) -> None:
         token_node = token.ast_node if hasattr(token, 'ast_node') else None
-        super().__init__(token_node)
+        super().__init__(token_node, key)
         self.token = token
+        if self._key is None: self._hash = hash(token.text)
     
     def node_name(self):
         return self.token.text
     
     def clone(self):
-        return TokenNode(self.token)
+        return TokenNode(self.token, self._key)
 
-    def __hash__(self):
-        if self.ast_node is not None:
-            return hash(node_key(self.ast_node))
-        return hash(self.token.text)
+    def _init_args(self):
+        from code_tokenize.tokens import Token
+        return (Token(None, self.token.text), self._key)
 
 
 class SymbolNode(Node):
 
-    def __init__(self, symbol):
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol) -> None:
         super().__init__()
         self.symbol = symbol
 
@@ -252,34 +505,95 @@ class SymbolNode(Node):
     def __hash__(self):
         return hash(self.symbol)
 
+    def _init_args(self):
+        return (self.symbol,)
+
+
+# Graph views --------------------------------------------------------
+
+class CSRView:
+    """
+    Edges of a graph in compressed sparse row (CSR) format
+
+    The successors of node i (by index) are neighbors[offsets[i]:offsets[i + 1]]
+    and their edge types are edge_types[offsets[i]:offsets[i + 1]].
+    Edge types are given as indices into edge_type_names.
+    """
+
+    __slots__ = ("offsets", "neighbors", "edge_types", "edge_type_names")
+
+    def __init__(self, offsets, neighbors, edge_types, edge_type_names) -> None:
+        self.offsets         = offsets
+        self.neighbors       = neighbors
+        self.edge_types      = edge_types
+        self.edge_type_names = edge_type_names
+
+    def edge_type_id(self, edge_type):
+        try:
+            return self.edge_type_names.index(edge_type)
+        except ValueError:
+            return -1
+
+    def successors(self, node_idx):
+        return self.neighbors[self.offsets[node_idx]:self.offsets[node_idx + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
 
 # Utils --------------------------------------------------------
 
 def node_key(node):
-    start_pos, end_pos = node.start_point, node.end_point
-    child_count = node.child_count
-    return (node.type, child_count, start_pos[0], start_pos[1], end_pos[0], end_pos[1])
+    # Byte offsets identify a position as well as points do
+    # but do not require a tuple allocation per access
+    return (node.type, node.child_count, node.start_byte, node.end_byte)
+
+
+def _is_token_type(obj_type):
+    # code_tokenize is imported lazily. Without the module, there cannot be a token.
+    tokens = sys.modules.get("code_tokenize.tokens")
+    return tokens is not None and issubclass(obj_type, tokens.Token)
+
+
+_ADD_NODE_DISPATCH: dict = {}
+
+def _resolve_add_node(node_type):
+    # Determines how objects of the given type are added to a graph
+    if issubclass(node_type, Node):
+        add_fn = CodeGraph._add_node
+    elif _is_token_type(node_type):
+        add_fn = CodeGraph._add_token
+    elif issubclass(node_type, str):
+        add_fn = CodeGraph._add_symbol
+    else:
+        # Everything else is handled as an AST node
+        add_fn = CodeGraph._add_ast_node
+
+    _ADD_NODE_DISPATCH[node_type] = add_fn
+    return add_fn
 
 
 class GraphToDot:
     
-    def __init__(self, graph, edge_colors = None):
+    def __init__(self, graph, edge_colors = None) -> None:
         self.graph = graph
         self.edge_colors = {} if edge_colors is None else edge_colors
 
-    def _dot_edge(self, source_id, rel_type, target_id):
+    def _dot_edge_style(self, rel_type):
         
         edge_color = self.edge_colors.get(rel_type, "black")
         edge_style = f"color={edge_color}"
 
-        return f'node{source_id} -> node{target_id} [label="{rel_type}" {edge_style}];\n'
+        return f' [label="{rel_type}" {edge_style}];\n'
 
     def run(self, writeable):
 
         def escape(token):
             return token.replace('"', '\\"')
 
-        writeable.write("digraph {\n\tcompound=true;\n")
+        # The output is assembled in memory and written at once
+        parts  = ["digraph {\n\tcompound=true;\n"]
+        append = parts.append
 
         tokens = []
 
@@ -287,116 +601,173 @@ class GraphToDot:
             if isinstance(node, TokenNode): 
                 tokens.append(node)
                 continue
-            node_name = node.node_name()
-            writeable.write(
-                f'\tnode{node._graph_idx}[shape="rectangle", label="{node_name}"];\n'
-            )
+            append('\tnode%d[shape="rectangle", label="%s"];\n' % (node._graph_idx, node.node_name()))
+
+        # Edges are read with a single scan over the edge arrays
+        sources, targets, edge_types, edge_type_names = self.graph.edge_arrays()
+
+        # The style of an edge only depends on its type
+        edge_styles   = [self._dot_edge_style(edge_type) for edge_type in edge_type_names]
+        next_token_id = edge_type_names.index(EDGE_NEXT_TOKEN) if EDGE_NEXT_TOKEN in edge_type_names else -1
+
+        next_token_edges, edges = [], []
+        append_next_token, append_edge = next_token_edges.append, edges.append
+
+        for source_idx, target_idx, type_id in zip(sources, targets, edge_types):
+            if type_id == next_token_id:
+                append_next_token("\t\tnode%d -> node%d%s" % (source_idx, target_idx, edge_styles[type_id]))
+            else:
+                append_edge("\tnode%d -> node%d%s" % (source_idx, target_idx, edge_styles[type_id]))
 
         # Tokens
-        writeable.write('\tsubgraph clusterNextToken {\n\t\tlabel="Tokens";\n\t\trank="same";\n')
+        append('\tsubgraph clusterNextToken {\n\t\tlabel="Tokens";\n\t\trank="same";\n')
 
-        next_token_edges = []
         for token_node in tokens:
-            token_text = escape(token_node.node_name())
-            writeable.write(
-                f'\t\tnode{token_node._graph_idx}[shape="rectangle", label="{token_text}"];\n'
-            )
-
-            for _, edge_type, next_token in token_node.successors_by_type("next_token"):
-                next_token_edges.append(
-                    self._dot_edge(token_node._graph_idx, edge_type, next_token._graph_idx)
-                )
-
-        for edge in next_token_edges:
-            writeable.write(f"\t\t{edge}")
-
-        writeable.write("\t}\n")
-
-        for src_node in self.graph:
-            for _, edge_type, target_node in src_node.successors():
-                if edge_type == "next_token": continue
-                edge_str = self._dot_edge(
-                    src_node._graph_idx,
-                    edge_type,
-                    target_node._graph_idx
-                )
-                writeable.write(f"\t{edge_str}")
+            append('\t\tnode%d[shape="rectangle", label="%s"];\n' % (token_node._graph_idx, escape(token_node.node_name())))
+
+        parts.extend(next_token_edges)
+
+        append("\t}\n")
+
+        parts.extend(edges)
         
-        writeable.write("}\n")
+        append("}\n")
+
+        writeable.write("".join(parts))
 
 
 # Propagate to leaves ----------------------------------------------------------------
 
-def _children(root_node):
-    return [c for _, edge_type, c in root_node.successors() if edge_type == "child"]
+def _child_map(csr):
+    # Children of each node (by index)
+    child_id = csr.edge_type_id(EDGE_CHILD)
+    offsets, neighbors, edge_types = csr.offsets, csr.neighbors, csr.edge_types
 
-def _bfs_token_search(root_node):
-    token_nodes = []
-    queue = [root_node]
+    child_map = []
+    for node_idx in range(len(csr)):
+        start, end = offsets[node_idx], offsets[node_idx + 1]
+        child_map.append([neighbors[k] for k in range(start, end) if edge_types[k] == child_id])
 
-    while len(queue) > 0:
-        current_node = queue.pop()
+    return child_map
 
-        if hasattr(current_node, "token"): token_nodes.append(current_node)
 
-        if len(token_nodes) == 0:
-            queue.extend(_children(current_node))
+def _compute_representer(root_idx, is_token, child_map):
+    # Every node is represented by its leftmost token (-1 if not reachable from root).
+    # Nodes are processed in post-order such that each node can reuse
+    # the representer of its leftmost child.
+    representer = [-1] * len(child_map)
 
-    return min(token_nodes, key =lambda c: c._graph_idx)
+    # The stack only holds integers: a node is pushed as ~idx (< 0)
+    # once all of its children are processed
+    stack = [root_idx]
 
+    while len(stack) > 0:
+        current_idx = stack.pop()
 
-def _left_token_search(root_node):
-    while not hasattr(root_node, "token"):
-        root_node = min(_children(root_node), key=lambda c: c._graph_idx)
-    return root_node
+        if current_idx < 0:
+            # Children are stored in AST order. However, the first child is not
+            # necessarily the one with the smallest index since token nodes are
+            # added to the graph before all other nodes.
+            current_idx = ~current_idx
+            representer[current_idx] = representer[min(child_map[current_idx])]
+            continue
 
+        if representer[current_idx] >= 0: continue
 
-def _compute_representer(graph):
-    representer = {}
+        if is_token[current_idx]:
+            representer[current_idx] = current_idx
+            continue
 
-    root_node = graph.root_node
-    queue     = [root_node]
+        stack.append(~current_idx)
+        stack.extend(child_map[current_idx])
 
-    while len(queue) > 0:
-        current_node = queue.pop(-1)
+    return representer
 
-        if current_node in representer: continue
 
-        representer[current_node] = _left_token_search(current_node)
-        queue.extend(_children(current_node))
+def _token_edges(csr, representers, is_token, syntax_ids):
+    # Edges between represented nodes are moved to their representers.
+    # Remaining edges between two tokens are copied directly.
+    offsets, neighbors, edge_types = csr.offsets, csr.neighbors, csr.edge_types
 
-    return representer
+    for node_idx in range(len(csr)):
+        representer   = representers[node_idx]
+        node_is_token = is_token[node_idx]
+
+        if representer < 0 and not node_is_token: continue
+
+        for k in range(offsets[node_idx], offsets[node_idx + 1]):
+            type_id = edge_types[k]
+            if type_id in syntax_ids: continue
+
+            successor_idx         = neighbors[k]
+            successor_representer = representers[successor_idx]
 
+            if representer >= 0 and successor_representer >= 0:
+                yield representer, successor_representer, type_id
+            elif node_is_token and is_token[successor_idx]:
+                yield node_idx, successor_idx, type_id
 
-SYNTAX_TYPES = {"child", "sibling"}
+
+def _token_edges_numpy(np, csr, representers, is_token, syntax_ids):
+    # Same as _token_edges but all edges are filtered at once
+    offsets    = np.frombuffer(csr.offsets, dtype = np.intc)
+    targets    = np.frombuffer(csr.neighbors, dtype = np.intc)
+    edge_types = np.frombuffer(csr.edge_types, dtype = np.uint16)
+    sources    = np.repeat(np.arange(len(csr), dtype = np.intc), np.diff(offsets))
+
+    representers = np.array(representers, dtype = np.intc)
+    is_token     = np.array(is_token, dtype = bool)
+
+    source_representers = representers[sources]
+    target_representers = representers[targets]
+    represented = (source_representers >= 0) & (target_representers >= 0)
+
+    keep  = represented | (is_token[sources] & is_token[targets])
+    keep &= ~np.isin(edge_types, np.array(list(syntax_ids), dtype = np.intc))
+
+    sources = np.where(represented, source_representers, sources)[keep]
+    targets = np.where(represented, target_representers, targets)[keep]
+
+    return zip(sources.tolist(), targets.tolist(), edge_types[keep].tolist())
+
+
+def _try_import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+SYNTAX_TYPES = {EDGE_CHILD, EDGE_SIBLING}
 
 def graph_to_tokens_only(graph):
-    representers = _compute_representer(graph)
+    if len(graph.token_nodes) == 0: return CodeGraph(lang = graph.lang)
+
+    csr          = graph.freeze()
+    is_token     = [isinstance(node, TokenNode) for node in graph]
+    representers = _compute_representer(graph.root_node._graph_idx, is_token, _child_map(csr))
     tokens       = graph.tokens
 
-    output = CodeGraph(tokens[0].ast_node, tokens, lang = graph.lang)
+    # The cloned token nodes share the AST keys with the original graph.
+    # The first token node is the root. It is taken from the clones since
+    # the tokens of an unpickled graph are not attached to an AST.
+    token_nodes = [token_node.clone() for token_node in graph.token_nodes]
+    output = CodeGraph(token_nodes[0], tokens, lang = graph.lang, token_nodes = token_nodes)
+    output_tokens = output.token_nodes
 
-    for ix, token_node in enumerate(graph.token_nodes):
-        output_node = output.token_nodes[ix]
+    edge_type_names = csr.edge_type_names
+    syntax_ids      = {csr.edge_type_id(edge_type) for edge_type in SYNTAX_TYPES}
 
-        for _, edge_type, successor in token_node.successors():
-            if edge_type in SYNTAX_TYPES: continue
-            if not hasattr(successor, "token"): continue
+    # The edge filter is vectorized if numpy is available
+    np = _try_import_numpy()
+    if np is not None:
+        token_edges = _token_edges_numpy(np, csr, representers, is_token, syntax_ids)
+    else:
+        token_edges = _token_edges(csr, representers, is_token, syntax_ids)
 
-            output_succ = output.token_nodes[successor._graph_idx]
-            output.add_relation(output_node, output_succ, edge_type)
+    # All token nodes are part of the output graph. Therefore, we can link them directly.
+    for source_idx, target_idx, type_id in token_edges:
+        output_tokens[source_idx].add_successor(output_tokens[target_idx], edge_type_names[type_id])
 
-    for node, representer in representers.items():
-        token_idx = representer._graph_idx
-        output_representer = output.token_nodes[token_idx]
-        
-        for _, edge_type, successor in node.successors():
-            if edge_type in SYNTAX_TYPES: continue
-            if successor not in representers: continue
-            successor_representer = representers[successor]
-            output_successor_representer = output.token_nodes[successor_representer._graph_idx]
-            output.add_relation(output_representer, 
-                                output_successor_representer, 
-                                edge_type)
-
-    return output
\ No newline at end of file
+    return output
@@ -38,9 +38,11 @@ def java_preprocess(source_code, **kwargs):
     output_tokens = TokenSequence(tokens[4:-1])
     
     root_node = output_tokens[0].ast_node
-    while root_node.parent is not None:
-        root_node = root_node.parent
+    parent    = root_node.parent
+    while parent is not None:
+        root_node = parent
         if root_node.type == "method_declaration": break
+        parent = root_node.parent
     
     return root_node, output_tokens
         
@@ -51,8 +53,10 @@ def _root_node(tokens):
     base_token  = tokens[0]
     current_ast = base_token.ast_node 
     
-    while current_ast.parent is not None:
-        current_ast = current_ast.parent
+    # Every parent access is a call into tree-sitter
+    parent = current_ast.parent
+    while parent is not None:
+        current_ast, parent = parent, parent.parent
 
     # If root only has one child skip to child
     if current_ast.child_count == 1:
@@ -1,5 +1,8 @@
 from ..visitor import ASTVisitor
 
+from ..graph import EDGE_CONTROLFLOW, EDGE_RETURN_FROM
+from ..cfg import is_statement_type
+
 from collections import defaultdict
 
 class ControlFlowVisitor(ASTVisitor):
@@ -7,33 +10,27 @@ class ControlFlowVisitor(ASTVisitor):
     def __init__(self, graph):
         super().__init__()
         self.graph = graph
-        self._last_stmts = tuple()
+        self._last_stmts = []
 
         self._returns_from  = []
         self._continue_from = defaultdict(list)
         self._break_from    = defaultdict(list)
 
     def _add_next(self, stmt_node):
-        for last_stmt_node in self._last_stmts:
-            self.graph.add_relation(last_stmt_node, stmt_node, "controlflow")
-        self._last_stmts = (stmt_node,)
+        self.graph.add_edges_from(self._last_stmts, stmt_node, EDGE_CONTROLFLOW)
+        self._last_stmts = [stmt_node]
 
     def _reset_last_stmts(self, reset_target):
+        # The current list is handed to the caller and
+        # is never modified by the visitor again
         last_stmts = self._last_stmts
-        self._last_stmts = (reset_target,)
+        self._last_stmts = [reset_target]
         return last_stmts
 
-    def visit_block(self, node):
-        
-        for stmt in node.children:
-            self.walk(stmt)
-
-        return False
-
     # Methods --------------------------------------------------------
 
     def visit_method_declaration(self, node):
-        outside_last, self._last_stmts = self._last_stmts, (node,)
+        outside_last, self._last_stmts = self._last_stmts, [node]
         outside_returns = self._returns_from
         self._returns_from = []
 
@@ -41,11 +38,9 @@ class ControlFlowVisitor(ASTVisitor):
             node.child_by_field_name("body")
         )
 
-        for stmt in self._last_stmts:
-            self.graph.add_relation(stmt, node, "return_from")
+        self.graph.add_edges_from(self._last_stmts, node, EDGE_RETURN_FROM)
 
-        for stmt in self._returns_from:
-            self.graph.add_relation(stmt, node, "return_from")
+        self.graph.add_edges_from(self._returns_from, node, EDGE_RETURN_FROM)
 
         self._returns_from = outside_returns
         self._last_stmts = outside_last
@@ -54,24 +49,24 @@ class ControlFlowVisitor(ASTVisitor):
     def visit_return_statement(self, node):
         self._add_next(node)
         self._returns_from.append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     # Labeled statements --------------------------------
 
     def visit_labeled_statement(self, node):
         name_node, _, body = node.children
-        name = self.graph.add_node(name_node) # has to be a token
-        name = name.token.text
+        name = self.graph.tokens.get_token_by_node(name_node).text # has to be a token
 
         self.walk(body)
         
         current_last = self._last_stmts
-        self._last_stmts = tuple(self._continue_from[name])
+        self._last_stmts = self._continue_from[name]
         self._add_next(body)
         self._continue_from[name] = []
 
-        self._last_stmts = current_last + tuple(self._break_from[name])
+        current_last.extend(self._break_from[name])
+        self._last_stmts = current_last
         self._break_from[name] = []
         return False
 
@@ -80,12 +75,10 @@ class ControlFlowVisitor(ASTVisitor):
 
         jump_label = "__LOOP__"
         if node.child_count > 2:
-            name_node  = node.children[1]
-            name_token = self.graph.add_node(name_node)
-            jump_label = name_token.token.text
+            jump_label = self.graph.tokens.get_token_by_node(node.children[1]).text
 
         self._break_from[jump_label].append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     def visit_continue_statement(self, node):
@@ -93,12 +86,10 @@ class ControlFlowVisitor(ASTVisitor):
 
         jump_label = "__LOOP__"
         if node.child_count > 2:
-            name_node  = node.children[1]
-            name_token = self.graph.add_node(name_node)
-            jump_label = name_token.token.text
+            jump_label = self.graph.tokens.get_token_by_node(node.children[1]).text
 
         self._continue_from[jump_label].append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     # Control structures --------------------------------
@@ -114,78 +105,56 @@ class ControlFlowVisitor(ASTVisitor):
         self.walk(node.child_by_field_name("alternative"))
         right_last_stmts = self._reset_last_stmts(node)
 
-        self._last_stmts = left_last_stmts + right_last_stmts
+        left_last_stmts.extend(right_last_stmts)
+        self._last_stmts = left_last_stmts
         return False
 
-    def visit_for_statement(self, node):
-
+    def _loop(self, node):
+        # Loops only differ in their syntax. The control flow is always the same.
         jump_label = "__LOOP__"
         prev_break, prev_continue = self._break_from[jump_label], self._continue_from[jump_label]
         self._break_from[jump_label], self._continue_from[jump_label] = [], []
 
         self._add_next(node)
         self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from[jump_label])
+        self._last_stmts.extend(self._continue_from[jump_label])
         self._add_next(node)
 
-        self._last_stmts += tuple(self._break_from[jump_label])
+        self._last_stmts.extend(self._break_from[jump_label])
 
         self._break_from[jump_label], self._continue_from[jump_label] = prev_break, prev_continue
         return False
 
-    def visit_while_statement(self, node): 
-
-        jump_label = "__LOOP__"
-        prev_break, prev_continue = self._break_from[jump_label], self._continue_from[jump_label]
-        self._break_from[jump_label], self._continue_from[jump_label] = [], []
-
-        self._add_next(node)
-        self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from[jump_label])
-        self._add_next(node)
-
-        self._last_stmts += tuple(self._break_from[jump_label])
+    def visit_for_statement(self, node):
+        return self._loop(node)
 
-        self._break_from[jump_label], self._continue_from[jump_label] = prev_break, prev_continue
-        return False
+    def visit_while_statement(self, node): 
+        return self._loop(node)
 
     def visit_do_statement(self, node): 
-
-        jump_label = "__LOOP__"
-        prev_break, prev_continue = self._break_from[jump_label], self._continue_from[jump_label]
-        self._break_from[jump_label], self._continue_from[jump_label] = [], []
-
-        self._add_next(node)
-        self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from[jump_label])
-        self._add_next(node)
-
-        self._last_stmts += tuple(self._break_from[jump_label])
-
-        self._break_from[jump_label], self._continue_from[jump_label] = prev_break, prev_continue
-        return False
+        return self._loop(node)
     
 
     def visit_try_statement(self, node):
         self._add_next(node)
-        starting_stmt = self._last_stmts
+        starting_stmt = list(self._last_stmts)
 
         self.walk(node.child_by_field_name("body"))
 
         exception_starting_stmts = self._last_stmts + starting_stmt
-        self._last_stmts = exception_starting_stmts
-        out_last_stmts = tuple()
+        self._last_stmts = list(exception_starting_stmts)
+        out_last_stmts = []
 
         finally_clauses = []
         for possible_exception in node.children:
             if possible_exception.type == "catch_clause":
                 self.walk(possible_exception)
-                out_last_stmts += self._last_stmts
-                self._last_stmts = exception_starting_stmts
+                out_last_stmts.extend(self._last_stmts)
+                self._last_stmts = list(exception_starting_stmts)
             if possible_exception.type == "finally_clause":
                 finally_clauses.append(possible_exception)
 
-        self._last_stmts += out_last_stmts
+        self._last_stmts.extend(out_last_stmts)
 
         for finally_clause in finally_clauses:
             self.walk(finally_clause)
@@ -194,10 +163,7 @@ class ControlFlowVisitor(ASTVisitor):
 
 
     def visit(self, node):
-        # All statement node type end with statement
-        # in tree-sitter
-        # Therefore, we can savely do this hack.
-        if node.type.endswith("statement"):
+        if is_statement_type(node.type):
             self._add_next(node)
             return False
         return True
\ No newline at end of file
@@ -1,139 +1,40 @@
+from ..graph import EDGE_NEXT_MAY_USE, EDGE_LAST_MAY_WRITE
+from ..flows import merge_rw_contexts, _EMPTY_CTX
+from ..dataflow import BaseDataFlowVisitor, _context
 
-from ..visitor import ASTVisitor
 
-from itertools import chain
-from copy import copy
-from contextlib import contextmanager
-from collections import defaultdict
-
-# Identifier context --------------------------------
-
-@contextmanager
-def _context(self, identifier_ctx):
-    current_context = getattr(self, '_id_context', None)
-    try:
-        self._id_context = identifier_ctx
-        yield
-    finally:
-        self._id_context = current_context
-
-def context(identifier_ctx):
-
-    def visitor_decorator(visitor_fn):
-        
-        def contextual_visitor(self, node):
-            with _context(self, identifier_ctx):
-                return visitor_fn(self, node)
-        
-        return contextual_visitor
-
-    return visitor_decorator
-
-
-def current_context(self):
-    return getattr(self, '_id_context', None)
-
-# ----------------------------------------------------
-
-class DataFlowVisitor(ASTVisitor):
-
-    def __init__(self, graph):
-        super().__init__()
-        self.graph = graph
-
-        self._last_writes = defaultdict(set)
-        self._last_reads  = defaultdict(set)
-
-        self._returns_from_rw  = []
-        self._continue_from_rw = []
-        self._break_from_rw    = []
-
-        self._var_scopes    = {}
-        self._current_scope = ["G"]
-
-    # Scope handling ----------------------------------------------------
-    
-    def register_in_scope(self, var_name):
-        current_scope = self._var_scopes
-        for scope in self._current_scope:
-            if scope not in current_scope:
-                current_scope[scope] = {"__vars__": set()}
-            current_scope = current_scope[scope]
-        current_scope["__vars__"].add(var_name)
-        return ".".join(self._current_scope + [var_name])
-    
-    def qualname(self, var_name):
-        candidate_scopes = []
-        current_scope    = self._var_scopes
-        for scope in self._current_scope:
-            if scope not in current_scope: break
-            candidate_scopes.append((scope, current_scope[scope]))
-            current_scope = current_scope[scope]
-
-        while len(candidate_scopes) > 1 and var_name not in candidate_scopes[-1][1]["__vars__"]:
-            candidate_scopes.pop(-1)
-        
-        return ".".join([c[0] for c in candidate_scopes] + [var_name])
-        
+class DataFlowVisitor(BaseDataFlowVisitor):
 
     # Variable writes ----------------------------------------------------
 
     def record_write(self, node):
+        if self._rw_shared: self._own_rw_context()
         node = self.graph.add_node(node)
         qname = self.register_in_scope(node.token.text)
-        self._last_reads[qname] = set()
-        self._last_writes[qname] = {node}
+        self._last_reads[qname] = ()
+        self._last_writes[qname] = (node,)
 
 
     def record_read(self, node):
+        if self._rw_shared: self._own_rw_context()
         node  = self.graph.add_node(node)
         qname = self.qualname(node.token.text)
         
-        for last_read in self._last_reads[qname]:
-            self.graph.add_relation(last_read, node, "next_may_use")
-        self._last_reads[qname] = {node}
-
-        for last_write in self._last_writes[qname]:
-            self.graph.add_relation(last_write, node, "last_may_write")
-
-
-    def visit_identifier(self, node):
-        node_context = current_context(self)
-        if node_context is None  :  return self.record_read(node) # Default to read variable
-        if node_context == "read":  return self.record_read(node)
-        if node_context == "write": return self.record_write(node)
-
-    # Read / Write handler ------------------------------------------
-    
-    def _copy_rw_context(self):
-        return (copy(self._last_reads), copy(self._last_writes))
-
-    def _restore_rw_context(self, rw_context):
-        rcontext, wcontext = rw_context
-        self._last_reads, after_rcontext  = rcontext, self._last_reads
-        self._last_writes, after_wcontext = wcontext, self._last_writes
+        self.graph.add_edges_from(self._last_reads.get(qname, ()), node, EDGE_NEXT_MAY_USE)
+        self._last_reads[qname] = (node,)
 
-        return (after_rcontext, after_wcontext)
+        self.graph.add_edges_from(self._last_writes.get(qname, ()), node, EDGE_LAST_MAY_WRITE)
 
-    def _join_rw_context(self, rw_context):
-        self._last_reads, self._last_writes = merge_rw_contexts(
-            (self._last_reads, self._last_writes),
-            rw_context
-        )
-
-    def _reset_rw_context(self):
-        self._last_reads = defaultdict(set)
-        self._last_writes = defaultdict(set)
 
     # Scopes --------------------------------------------------------
 
     def visit_block(self, node):
-        self._current_scope.append("<block>")
+        self._enter_scope("<block>")
 
         for child in node.children:
             self.walk(child)
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         return False
 
     # Functions --------------------------------------------------------
@@ -149,17 +50,17 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_method_declaration(self, node):
-        self._returns_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._returns_from_rw.append(_EMPTY_CTX)
         name_node = node.child_by_field_name("name")
         name      = self.graph.tokens.get_token_by_node(name_node).text
-        self._current_scope.append(name)
+        self._enter_scope(name)
 
         with _context(self, "write"):
             self.walk(node.child_by_field_name("parameters"))
 
         self.walk(node.child_by_field_name("body"))
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         self._join_rw_context(self._returns_from_rw.pop(-1))
         return False
 
@@ -182,28 +83,31 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_while_statement(self, node): 
+        condition = node.child_by_field_name("condition")
+        body = node.child_by_field_name("body")
+
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
 
         after_test_context = self._copy_rw_context()
 
-        self._break_from_rw.append((defaultdict(set), defaultdict(set)))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw.append(_EMPTY_CTX)
+        self._continue_from_rw.append(_EMPTY_CTX)
 
-        self.walk(node.child_by_field_name("body"))
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
-        self._break_from_rw[-1] = (defaultdict(set), defaultdict(set))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw[-1] = _EMPTY_CTX
+        self._continue_from_rw.append(_EMPTY_CTX)
         # No fixpoint computation?
         # Is this enough?
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
-        self.walk(node.child_by_field_name("body"))
+            self.walk(condition)
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
             
         self._join_rw_context(after_test_context)
         self._join_rw_context(self._break_from_rw.pop(-1))
@@ -212,24 +116,26 @@ class DataFlowVisitor(ASTVisitor):
 
 
     def visit_do_statement(self, node):
+        body = node.child_by_field_name("body")
+        condition = node.child_by_field_name("condition")
 
-        self._break_from_rw.append((defaultdict(set), defaultdict(set)))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw.append(_EMPTY_CTX)
+        self._continue_from_rw.append(_EMPTY_CTX)
 
-        self.walk(node.child_by_field_name("body"))
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
-        self._break_from_rw[-1] = (defaultdict(set), defaultdict(set))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw[-1] = _EMPTY_CTX
+        self._continue_from_rw.append(_EMPTY_CTX)
         # No fixpoint computation?
         # Is this enough?
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
-        self.walk(node.child_by_field_name("body"))
+            self.walk(condition)
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
 
         self._join_rw_context(self._break_from_rw.pop(-1))
 
@@ -237,35 +143,39 @@ class DataFlowVisitor(ASTVisitor):
 
 
     def visit_for_statement(self, node): 
-        self._current_scope.append("<if>") # We have to cheat here for registering id in the right scope
+        condition = node.child_by_field_name("condition")
+        body = node.child_by_field_name("body")
+        update = node.child_by_field_name("update")
+
+        self._enter_scope("<if>") # We have to cheat here for registering id in the right scope
         self.walk(node.child_by_field_name("init"))
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
         
         after_zero_iterations = self._copy_rw_context()
 
-        self._break_from_rw.append((defaultdict(set), defaultdict(set)))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw.append(_EMPTY_CTX)
+        self._continue_from_rw.append(_EMPTY_CTX)
 
-        self.walk(node.child_by_field_name("body"))
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
-        self.walk(node.child_by_field_name("update"))
+        self.walk(update)
 
-        self._break_from_rw[-1] = (defaultdict(set), defaultdict(set))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw[-1] = _EMPTY_CTX
+        self._continue_from_rw.append(_EMPTY_CTX)
 
         # No fixpoint computation?
         # Is this enough?
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
-        self.walk(node.child_by_field_name("body"))
+            self.walk(condition)
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
-        self.walk(node.child_by_field_name("update"))
+        self.walk(update)
 
         self._join_rw_context(after_zero_iterations)
         self._join_rw_context(self._break_from_rw.pop(-1))
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         return False
 
     # Field access -------------------------------------------------------
@@ -311,11 +221,13 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_update_expression(self, node):
+        children = node.children
+
         with _context(self, "read"):
-            for child in node.children: self.walk(child)
+            for child in children: self.walk(child)
         
         with _context(self, "write"):
-            for child in node.children: self.walk(child)
+            for child in children: self.walk(child)
         
         return False
 
@@ -329,8 +241,8 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_lambda_expression(self, node):
-        self._current_scope.append("<lambda>")
-        self._returns_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._enter_scope("<lambda>")
+        self._returns_from_rw.append(_EMPTY_CTX)
         rw_context = self._copy_rw_context()
 
         with _context(self, "write"):
@@ -340,22 +252,6 @@ class DataFlowVisitor(ASTVisitor):
 
         self._restore_rw_context(rw_context)
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         self._returns_from_rw.pop(-1)
         return False
-
-
-# Helper --------------------------------------------------------
-
-def merge_flows(source_flow, target_flow):
-    common_vars = set.union(set(source_flow.keys()), set(target_flow.keys()))
-    return defaultdict(set, {v: set(chain(source_flow[v], target_flow[v])) for v in common_vars})
-
-def merge_rw_contexts(source_rw_contex, target_rw_contex):
-    source_rcontext, source_wcontext = source_rw_contex
-    target_rcontext, target_wcontext = target_rw_contex
-
-    result_rcontext = merge_flows(source_rcontext, target_rcontext)
-    result_wcontext = merge_flows(source_wcontext, target_wcontext)
-
-    return (result_rcontext, result_wcontext)
\ No newline at end of file
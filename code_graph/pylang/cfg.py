@@ -1,11 +1,14 @@
 from ..visitor import ASTVisitor
 
+from ..graph import EDGE_CONTROLFLOW, EDGE_RETURN_FROM, EDGE_YIELD_FROM, EDGE_ASSIGNED_FROM
+from ..cfg import is_statement_type
+
 class ControlFlowVisitor(ASTVisitor):
     
     def __init__(self, graph):
         super().__init__()
         self.graph = graph
-        self._last_stmts = tuple()
+        self._last_stmts = []
 
         self._break_from    = []
         self._continue_from = []
@@ -14,24 +17,18 @@ class ControlFlowVisitor(ASTVisitor):
 
 
     def _add_next(self, stmt_node):
-        for last_stmt_node in self._last_stmts:
-            self.graph.add_relation(last_stmt_node, stmt_node, "controlflow")
-        self._last_stmts = (stmt_node,)
+        self.graph.add_edges_from(self._last_stmts, stmt_node, EDGE_CONTROLFLOW)
+        self._last_stmts = [stmt_node]
 
     def _reset_last_stmts(self, reset_target):
+        # The current list is handed to the caller and
+        # is never modified by the visitor again
         last_stmts = self._last_stmts
-        self._last_stmts = reset_target
+        self._last_stmts = list(reset_target)
         return last_stmts
 
-    def visit_block(self, node):
-        
-        for stmt in node.children:
-            self.walk(stmt)
-
-        return False
-
     def visit_function_definition(self, node):
-        outside_last, self._last_stmts = self._last_stmts, (node,)
+        outside_last, self._last_stmts = self._last_stmts, [node]
         outside_returns, outside_yields = self._returns_from, self._yields_from
         self._returns_from, self._yields_from = [], []
 
@@ -39,14 +36,11 @@ class ControlFlowVisitor(ASTVisitor):
             node.child_by_field_name("body")
         )
 
-        for stmt in self._last_stmts:
-            self.graph.add_relation(stmt, node, "return_from")
+        self.graph.add_edges_from(self._last_stmts, node, EDGE_RETURN_FROM)
 
-        for stmt in self._returns_from:
-            self.graph.add_relation(stmt, node, "return_from")
+        self.graph.add_edges_from(self._returns_from, node, EDGE_RETURN_FROM)
 
-        for stmt in self._yields_from:
-            self.graph.add_relation(stmt, node, "yield_from")
+        self.graph.add_edges_from(self._yields_from, node, EDGE_YIELD_FROM)
 
         self._returns_from, self._yields_from = outside_returns, outside_yields
         self._last_stmts = outside_last
@@ -63,13 +57,14 @@ class ControlFlowVisitor(ASTVisitor):
         self.walk(node.child_by_field_name("alternative"))
         right_last_stmts = self._reset_last_stmts((node,))
 
-        self._last_stmts = left_last_stmts + right_last_stmts
+        left_last_stmts.extend(right_last_stmts)
+        self._last_stmts = left_last_stmts
         return False
 
     def visit_return_statement(self, node):
         self._add_next(node)
         self._returns_from.append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     def visit_yield_statement(self, node):
@@ -80,13 +75,13 @@ class ControlFlowVisitor(ASTVisitor):
     def visit_break_statement(self, node):
         self._add_next(node)
         self._break_from.append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     def visit_continue_statement(self, node):
         self._add_next(node)
         self._continue_from.append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     def visit_for_statement(self, node):
@@ -96,12 +91,12 @@ class ControlFlowVisitor(ASTVisitor):
 
         self._add_next(node)
         self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from)
+        self._last_stmts.extend(self._continue_from)
         self._add_next(node)
 
         self.walk(node.child_by_field_name("alternative"))
 
-        self._last_stmts += tuple(self._break_from)
+        self._last_stmts.extend(self._break_from)
 
         self._break_from, self._continue_from = prev_break, prev_continue
         return False
@@ -113,37 +108,37 @@ class ControlFlowVisitor(ASTVisitor):
 
         self._add_next(node)
         self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from)
+        self._last_stmts.extend(self._continue_from)
         self._add_next(node)
 
         self.walk(node.child_by_field_name("alternative"))
 
-        self._last_stmts += tuple(self._break_from)
+        self._last_stmts.extend(self._break_from)
 
         self._break_from, self._continue_from = prev_break, prev_continue
         return False
     
     def visit_try_statement(self, node):
         self._add_next(node)
-        starting_stmt = self._last_stmts
+        starting_stmt = list(self._last_stmts)
 
         self.walk(node.child_by_field_name("body"))
         self.walk(node.child_by_field_name("alternative"))
 
         exception_starting_stmts = self._last_stmts + starting_stmt
-        self._last_stmts = exception_starting_stmts
-        out_last_stmts = tuple()
+        self._last_stmts = list(exception_starting_stmts)
+        out_last_stmts = []
 
         finally_clauses = []
         for possible_exception in node.children:
             if possible_exception.type == "except_clause":
                 self.walk(possible_exception)
-                out_last_stmts += self._last_stmts
-                self._last_stmts = exception_starting_stmts
+                out_last_stmts.extend(self._last_stmts)
+                self._last_stmts = list(exception_starting_stmts)
             if possible_exception.type == "finally_clause":
                 finally_clauses.append(possible_exception)
 
-        self._last_stmts += out_last_stmts
+        self._last_stmts.extend(out_last_stmts)
 
         for finally_clause in finally_clauses:
             self.walk(finally_clause)
@@ -151,10 +146,7 @@ class ControlFlowVisitor(ASTVisitor):
         return False
 
     def visit(self, node):
-        # All statement node type end with statement
-        # in tree-sitter
-        # Therefore, we can savely do this hack.
-        if node.type.endswith("statement"):
+        if is_statement_type(node.type):
             self._add_next(node)
             return False
         return True
@@ -165,11 +157,11 @@ class ControlFlowVisitor(ASTVisitor):
 class SubControlFlowVisitor(ControlFlowVisitor):
 
     def _assigned_from(self, node, target):
-        self.graph.add_relation(node, target, "assigned_from")
+        self.graph.add_relation(node, target, EDGE_ASSIGNED_FROM)
 
     # Override visit to allow sub statement flow
     def visit(self, node):
-        if node.type.endswith("statement"):
+        if is_statement_type(node.type):
             self._add_next(node)
 
     # Sub statement flow --------------------------------
@@ -190,9 +182,7 @@ class SubControlFlowVisitor(ControlFlowVisitor):
             targets = [targets]
         else:
             # Find target identifier
-            idfinder = IdFinder()
-            idfinder.walk(targets)
-            targets = idfinder._id_nodes
+            targets = _find_identifiers(targets)
 
         for target in targets:
             self._assigned_from(value, target)
@@ -220,7 +210,7 @@ class SubControlFlowVisitor(ControlFlowVisitor):
             self.walk(value)
             self._add_next(node)
         self._returns_from.append(node)
-        self._last_stmts = tuple()
+        self._last_stmts = []
         return False
 
     def visit_yield_statement(self, node):
@@ -264,25 +254,25 @@ class SubControlFlowVisitor(ControlFlowVisitor):
         return False
 
     def visit_try_statement(self, node):
-        starting_stmt = self._last_stmts
+        starting_stmt = list(self._last_stmts)
 
         self.walk(node.child_by_field_name("body"))
         self.walk(node.child_by_field_name("alternative"))
 
         exception_starting_stmts = self._last_stmts + starting_stmt
-        self._last_stmts = exception_starting_stmts
-        out_last_stmts = tuple()
+        self._last_stmts = list(exception_starting_stmts)
+        out_last_stmts = []
 
         finally_clauses = []
         for possible_exception in node.children:
             if possible_exception.type == "except_clause":
                 self.walk(possible_exception)
-                out_last_stmts += self._last_stmts
-                self._last_stmts = exception_starting_stmts
+                out_last_stmts.extend(self._last_stmts)
+                self._last_stmts = list(exception_starting_stmts)
             if possible_exception.type == "finally_clause":
                 finally_clauses.append(possible_exception)
 
-        self._last_stmts += out_last_stmts
+        self._last_stmts.extend(out_last_stmts)
 
         for finally_clause in finally_clauses:
             self.walk(finally_clause)
@@ -296,14 +286,16 @@ class SubControlFlowVisitor(ControlFlowVisitor):
         prev_break, prev_continue = self._break_from, self._continue_from
         self._break_from, self._continue_from = [], []
 
-        self.walk(node.child_by_field_name("condition"))
+        condition = node.child_by_field_name("condition")
+
+        self.walk(condition)
         self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from)
-        self.walk(node.child_by_field_name("condition"))
+        self._last_stmts.extend(self._continue_from)
+        self.walk(condition)
 
         self.walk(node.child_by_field_name("alternative"))
 
-        self._last_stmts += tuple(self._break_from)
+        self._last_stmts.extend(self._break_from)
 
         self._break_from, self._continue_from = prev_break, prev_continue
         return False
@@ -313,17 +305,18 @@ class SubControlFlowVisitor(ControlFlowVisitor):
         prev_break, prev_continue = self._break_from, self._continue_from
         self._break_from, self._continue_from = [], []
 
-        self.walk(node.child_by_field_name("left"))
-        self._assigned_from(node.child_by_field_name("left"), 
-                                node.child_by_field_name("right"))
+        left, body = node.child_by_field_name("left"), node.child_by_field_name("body")
 
-        self.walk(node.child_by_field_name("body"))
-        self._last_stmts += tuple(self._continue_from)
-        self.walk(node.child_by_field_name("body"))
+        self.walk(left)
+        self._assigned_from(left, node.child_by_field_name("right"))
+
+        self.walk(body)
+        self._last_stmts.extend(self._continue_from)
+        self.walk(body)
 
         self.walk(node.child_by_field_name("alternative"))
 
-        self._last_stmts += tuple(self._break_from)
+        self._last_stmts.extend(self._break_from)
 
         self._break_from, self._continue_from = prev_break, prev_continue
         return False
@@ -357,7 +350,8 @@ class SubControlFlowVisitor(ControlFlowVisitor):
         return False
 
     def visit_comparison_operator(self, node):
-        left, right = node.children[0], node.children[-1]
+        children = node.children
+        left, right = children[0], children[-1]
 
         self.walk(left)
         self.walk(right)
@@ -390,10 +384,17 @@ class SubControlFlowVisitor(ControlFlowVisitor):
 
 # Id finder --------------------------------
 
-class IdFinder(ASTVisitor):
+def _find_identifiers(root_node):
+    """Collects all identifiers below the given node in pre-order (ERROR nodes are skipped)"""
+    id_nodes, stack = [], [root_node]
 
-    def __init__(self):
-        self._id_nodes = []
-    
-    def visit_identifier(self, node):
-        self._id_nodes.append(node)
\ No newline at end of file
+    while len(stack) > 0:
+        current_node = stack.pop()
+        node_type    = current_node.type
+
+        if node_type == "identifier":
+            id_nodes.append(current_node)
+        elif node_type != "ERROR" and current_node.child_count > 0:
+            stack.extend(reversed(current_node.children))
+
+    return id_nodes
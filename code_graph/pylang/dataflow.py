@@ -1,131 +1,54 @@
 
-from ..visitor import ASTVisitor
-
 from ..graph import SymbolNode
+from ..graph import EDGE_OCCURRENCE_OF, EDGE_NEXT_MAY_USE, EDGE_LAST_MAY_WRITE
+from ..flows import merge_flows, merge_rw_contexts, _EMPTY_CTX
+from ..dataflow import BaseDataFlowVisitor, _context, context
 
-from itertools import chain
-from copy import copy
-from contextlib import contextmanager
-from collections import defaultdict
-
-# Identifier context --------------------------------
-
-@contextmanager
-def _context(self, identifier_ctx):
-    current_context = getattr(self, '_id_context', None)
-    try:
-        self._id_context = identifier_ctx
-        yield
-    finally:
-        self._id_context = current_context
-
-def context(identifier_ctx):
-
-    def visitor_decorator(visitor_fn):
-        
-        def contextual_visitor(self, node):
-            with _context(self, identifier_ctx):
-                return visitor_fn(self, node)
-        
-        return contextual_visitor
-
-    return visitor_decorator
-
-
-def current_context(self):
-    return getattr(self, '_id_context', None)
-
-# ----------------------------------------------------
 
-
-class DataFlowVisitor(ASTVisitor):
+class DataFlowVisitor(BaseDataFlowVisitor):
 
     def __init__(self, graph):
-        super().__init__()
-        self.graph = graph
-
+        super().__init__(graph)
         self._var_nodes = {}
 
-        self._last_writes = defaultdict(set)
-        self._last_reads  = defaultdict(set)
-
-        self._returns_from_rw  = []
-        self._continue_from_rw = []
-        self._break_from_rw    = []
-
-        self._var_scopes    = {}
-        self._current_scope = ["G"]
-
-    # Scope handling ----------------------------------------------------
-    
-    def register_in_scope(self, var_name):
-        current_scope = self._var_scopes
-        for scope in self._current_scope:
-            if scope not in current_scope:
-                current_scope[scope] = {"__vars__": set()}
-            current_scope = current_scope[scope]
-        current_scope["__vars__"].add(var_name)
-        return ".".join(self._current_scope + [var_name])
-    
-    def qualname(self, var_name):
-        candidate_scopes = []
-        current_scope    = self._var_scopes
-        for scope in self._current_scope:
-            if scope not in current_scope: break
-            candidate_scopes.append((scope, current_scope[scope]))
-            current_scope = current_scope[scope]
-
-        while len(candidate_scopes) > 1 and var_name not in candidate_scopes[-1][1]["__vars__"]:
-            candidate_scopes.pop(-1)
-        
-        return ".".join([c[0] for c in candidate_scopes] + [var_name])
-        
-
     # Variable writes ----------------------------------------------------
 
     def _occurrence_of(self, node, qname):
-        if qname not in self._var_nodes:
-            name = qname.split(".")[-1]
-            self._var_nodes[qname] =  self.graph.add_node(name)
+        # The symbol node is only created for the first occurrence.
+        # Both nodes are part of the graph already and can be linked directly.
+        var_node = self._var_nodes.get(qname, None)
+        if var_node is None:
+            name = qname.rsplit(".", 1)[-1]
+            var_node = self._var_nodes[qname] = self.graph.add_node(name)
 
-        var_node = self._var_nodes[qname]
-        self.graph.add_relation(node, var_node, "occurrence_of")
+        node.add_successor(var_node, EDGE_OCCURRENCE_OF)
 
 
     def record_write(self, node):
+        if self._rw_shared: self._own_rw_context()
         node = self.graph.add_node(node)
         qname = self.register_in_scope(node.token.text)
         self._occurrence_of(node, qname)
-        self._last_reads[qname] = set()
-        self._last_writes[qname] = {node}
+        self._last_reads[qname] = ()
+        self._last_writes[qname] = (node,)
 
 
     def record_read(self, node):
+        if self._rw_shared: self._own_rw_context()
         node  = self.graph.add_node(node)
-
-        assert hasattr(node, "token"), "Expected to read from a token, but got: %s" % node
-
         qname = self.qualname(node.token.text)
         self._occurrence_of(node, qname)
         
-        for last_read in self._last_reads[qname]:
-            self.graph.add_relation(last_read, node, "next_may_use")
-        self._last_reads[qname] = {node}
+        self.graph.add_edges_from(self._last_reads.get(qname, ()), node, EDGE_NEXT_MAY_USE)
+        self._last_reads[qname] = (node,)
 
-        for last_write in self._last_writes[qname]:
-            self.graph.add_relation(last_write, node, "last_may_write")
+        self.graph.add_edges_from(self._last_writes.get(qname, ()), node, EDGE_LAST_MAY_WRITE)
 
 
-    def visit_identifier(self, node):
-        node_context = current_context(self)
-        if node_context is None  :  return self.record_read(node) # Default to read variable
-        if node_context == "read":  return self.record_read(node)
-        if node_context == "write": return self.record_write(node)
-
     # Scopes --------------------------------------------------------
 
     def visit_comprehension(self, node):
-        self._current_scope.append("<comprehension>")
+        self._enter_scope("<comprehension>")
 
         for child in node.children:
             if child.type.endswith("clause"):
@@ -133,7 +56,7 @@ class DataFlowVisitor(ASTVisitor):
 
         self.walk(node.child_by_field_name("body"))
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         return False
 
     def visit_list_comprehension(self, node):
@@ -186,23 +109,30 @@ class DataFlowVisitor(ASTVisitor):
 
     # Assignments --------------------------------------------------
 
-    def visit_assignment(self, node):
+    def _assignment(self, left, right):
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("right"))
+            self.walk(right)
 
         with _context(self, "write"):
-            self.walk(node.child_by_field_name("left"))
+            self.walk(left)
         
         return False
 
+    def visit_assignment(self, node):
+        return self._assignment(
+            node.child_by_field_name("left"), node.child_by_field_name("right")
+        )
+
     def visit_annotated_assignment(self, node):
         return self.visit_assignment(node)
 
     def visit_augmented_assignment(self, node):
+        left = node.child_by_field_name("left")
+
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("left"))
+            self.walk(left)
 
-        return self.visit_assignment(node)
+        return self._assignment(left, node.child_by_field_name("right"))
 
     # Attribute ----------------------------------------------------
 
@@ -213,26 +143,6 @@ class DataFlowVisitor(ASTVisitor):
 
     # Branching --------------------------------------------------------
 
-    def _copy_rw_context(self):
-        return (copy(self._last_reads), copy(self._last_writes))
-
-    def _restore_rw_context(self, rw_context):
-        rcontext, wcontext = rw_context
-        self._last_reads, after_rcontext  = rcontext, self._last_reads
-        self._last_writes, after_wcontext = wcontext, self._last_writes
-
-        return (after_rcontext, after_wcontext)
-
-    def _join_rw_context(self, rw_context):
-        self._last_reads, self._last_writes = merge_rw_contexts(
-            (self._last_reads, self._last_writes),
-            rw_context
-        )
-
-    def _reset_rw_context(self):
-        self._last_reads = defaultdict(set)
-        self._last_writes = defaultdict(set)
-
     def visit_if_statement(self, node):
         with _context(self, "read"):
             self.walk(node.child_by_field_name("condition"))
@@ -251,11 +161,12 @@ class DataFlowVisitor(ASTVisitor):
 
     @context("read")
     def visit_conditional_expression(self, node):
-        if len(node.children) != 5: return
-        if_node, _, comparison_node, _, else_node = node.children
+        children = node.children
+        if len(children) != 5: return
+        if_node, _, comparison_node, _, else_node = children
         self.walk(comparison_node)
 
-        last_reads_copy = copy(self._last_reads)
+        last_reads_copy = self._last_reads.copy()
         self.walk(if_node)
 
         self._last_reads, after_if_reads = last_reads_copy, self._last_reads
@@ -281,28 +192,31 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_while_statement(self, node):
+        condition = node.child_by_field_name("condition")
+        body = node.child_by_field_name("body")
+
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
 
         after_test_context = self._copy_rw_context()
 
-        self._break_from_rw.append((defaultdict(set), defaultdict(set)))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw.append(_EMPTY_CTX)
+        self._continue_from_rw.append(_EMPTY_CTX)
 
-        self.walk(node.child_by_field_name("body"))
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
-        self._break_from_rw[-1] = (defaultdict(set), defaultdict(set))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw[-1] = _EMPTY_CTX
+        self._continue_from_rw.append(_EMPTY_CTX)
         # No fixpoint computation?
         # Is this enough?
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
-        self.walk(node.child_by_field_name("body"))
+            self.walk(condition)
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
         with _context(self, "read"):
-            self.walk(node.child_by_field_name("condition"))
+            self.walk(condition)
             
         self._join_rw_context(after_test_context)
         self.walk(node.child_by_field_name("alternative"))
@@ -312,28 +226,31 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_for_statement(self, node):
+        left = node.child_by_field_name("left")
+        body = node.child_by_field_name("body")
+
         with _context(self, "read"):
             self.walk(node.child_by_field_name("right"))
         
         after_zero_iterations = self._copy_rw_context()
 
-        self._break_from_rw.append((defaultdict(set), defaultdict(set)))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw.append(_EMPTY_CTX)
+        self._continue_from_rw.append(_EMPTY_CTX)
 
         with _context(self, "write"):
-            self.walk(node.child_by_field_name("left"))
+            self.walk(left)
 
-        self.walk(node.child_by_field_name("body"))
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
-        self._break_from_rw[-1] = (defaultdict(set), defaultdict(set))
-        self._continue_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._break_from_rw[-1] = _EMPTY_CTX
+        self._continue_from_rw.append(_EMPTY_CTX)
 
         # No fixpoint computation?
         # Is this enough?
         with _context(self, "write"):
-            self.walk(node.child_by_field_name("left"))
-        self.walk(node.child_by_field_name("body"))
+            self.walk(left)
+        self.walk(body)
         self._join_rw_context(self._continue_from_rw.pop(-1))
 
         self._join_rw_context(after_zero_iterations)
@@ -356,15 +273,15 @@ class DataFlowVisitor(ASTVisitor):
         return False
 
     def visit_function_definition(self, node):
-        self._returns_from_rw.append((defaultdict(set), defaultdict(set)))
+        self._returns_from_rw.append(_EMPTY_CTX)
         name_node = node.child_by_field_name("name")
         name      = self.graph.tokens.get_token_by_node(name_node).text
-        self._current_scope.append(name)
+        self._enter_scope(name)
 
         self.walk(node.child_by_field_name("parameters"))
         self.walk(node.child_by_field_name("body"))
 
-        self._current_scope.pop(-1)
+        self._leave_scope()
         self._join_rw_context(self._returns_from_rw.pop(-1))
         return False
 
@@ -407,19 +324,3 @@ class DataFlowVisitor(ASTVisitor):
     
     def visit_string(self, node):
         return False # Currently we do not support f-strings
-
-
-# Helper --------------------------------------------------------
-
-def merge_flows(source_flow, target_flow):
-    common_vars = set.union(set(source_flow.keys()), set(target_flow.keys()))
-    return defaultdict(set, {v: set(chain(source_flow[v], target_flow[v])) for v in common_vars})
-
-def merge_rw_contexts(source_rw_contex, target_rw_contex):
-    source_rcontext, source_wcontext = source_rw_contex
-    target_rcontext, target_wcontext = target_rw_contex
-
-    result_rcontext = merge_flows(source_rcontext, target_rcontext)
-    result_wcontext = merge_flows(source_wcontext, target_wcontext)
-
-    return (result_rcontext, result_wcontext)
\ No newline at end of file
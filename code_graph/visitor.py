@@ -2,6 +2,10 @@ from code_ast import ASTVisitor as BaseVisitor
 
 class ASTVisitor(BaseVisitor):
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_table = _visit_table(cls)
+
     # Error handling ------------------------------------------------
 
     def visit_ERROR(self, node):
@@ -17,4 +21,64 @@ class ASTVisitor(BaseVisitor):
         Can be overriden by subclasses.
         
         """
-        return False
\ No newline at end of file
+        return False
+
+    # Dispatch ------------------------------------------------
+
+    def on_visit(self, node):
+        # Visitor functions are looked up in a per class table
+        # instead of formatting a method name for every node.
+        # The walk below inlines this dispatch.
+        visitor_fn = self._visit_table.get(node.type, None)
+        if visitor_fn is None: return self.visit(node) is not False
+        return visitor_fn(self, node) is not False
+
+    # Navigation ------------------------------------------------
+
+    def walk(self, root_node):
+        """
+        Walks the AST rooted at the given node in pre-order.
+
+        Nodes that still have to be visited are kept on an explicit stack.
+        The subtree of a node is only entered if its visitor
+        does not return False.
+
+        In contrast to the walk of code_ast, leave callbacks are not
+        issued since none of the graph analyses rely on them.
+        Visitor functions are dispatched directly (see on_visit).
+
+        """
+        if root_node is None: return
+
+        visit_table = self._visit_table
+        visit       = self.visit
+
+        stack = [root_node]
+        while len(stack) > 0:
+            current_node = stack.pop()
+
+            visitor_fn = visit_table.get(current_node.type, None)
+            if visitor_fn is None:
+                descend = visit(current_node)
+            else:
+                descend = visitor_fn(self, current_node)
+
+            if descend is not False:
+                stack.extend(reversed(current_node.children))
+
+
+# Helper --------------------------------------------------------
+
+def _visit_table(cls):
+    """Maps node types to the (unbound) visitor functions of the given class"""
+    table = {}
+
+    # Base classes first such that subclasses override their visitors
+    for klass in reversed(cls.__mro__):
+        for name, visitor_fn in vars(klass).items():
+            if name.startswith("visit_"): table[name[6:]] = visitor_fn
+
+    return table
+
+
+ASTVisitor._visit_table = _visit_table(ASTVisitor)
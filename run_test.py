@@ -1,9 +1,15 @@
 import os
 import argparse
 import json
+import pickle
+import sqlite3
+import hashlib
 
 from time import time
 
+from itertools import islice
+from multiprocessing import Pool
+
 from tqdm import tqdm
 
 from glob import glob
@@ -14,9 +20,11 @@ def load_examples(files):
     for n, file in enumerate(files):
         name = os.path.basename(file)
         desc = "File %d / %d: %s" % (n+1, len(files), name)
-        total = sum(1 for _ in open(file, "r"))
-        with open(file, "r") as lines:
-            for line in tqdm(lines, total = total, desc = desc):
+        # Progress is measured in bytes (no extra pass to count the lines)
+        total = os.path.getsize(file)
+        with open(file, "rb") as lines, tqdm(total = total, desc = desc, unit = "B", unit_scale = True) as pbar:
+            for line in lines:
+                pbar.update(len(line))
                 yield json.loads(line)
 
 def tokens_to_text(tokens):
@@ -24,10 +32,90 @@ def tokens_to_text(tokens):
     return "public class Test{\n%s\n}" % method_text
 
 
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if len(batch) == 0: return
+        yield batch
+
+
+# Graph cache (optional) ----------------------------------------------------
+# Graphs are stored pickled (detached from the AST) by the SHA-256 of their code
+
+def open_cache(cache_file):
+    cache = sqlite3.connect(cache_file)
+    # Readers (the workers) are not blocked while the main process writes
+    cache.execute("PRAGMA journal_mode=WAL")
+    cache.execute("CREATE TABLE IF NOT EXISTS graphs (sha BLOB PRIMARY KEY, graph BLOB)")
+    return cache
+
+def code_key(code):
+    return hashlib.sha256(code.encode("utf-8")).digest()
+
+def cache_lookup(cache, key):
+    row = cache.execute("SELECT graph FROM graphs WHERE sha = ?", (key,)).fetchone()
+    if row is None: return None
+    return pickle.loads(row[0])
+
+def cache_store(cache, key, graph_blob):
+    cache.execute("INSERT OR REPLACE INTO graphs VALUES (?, ?)", (key, graph_blob))
+
+
+# Example processing ----------------------------------------------------------
+# Examples are processed in worker processes. Each worker reads from its own
+# cache connection while new graphs are only written by the main process.
+# New graphs are committed after each batch. Therefore, workers see them
+# in the following batches.
+
+_worker_cache = None
+
+def init_worker(cache_file):
+    global _worker_cache
+    if cache_file: _worker_cache = open_cache(cache_file)
+
+
+def process_example(example):
+    tokens = example["tokens"]
+    length = len(tokens)
+    code   = tokens_to_text(tokens)
+    key    = code_key(code) if _worker_cache is not None else None
+
+    start_time = time()
+
+    graph = None
+    if _worker_cache is not None:
+        try:
+            graph = cache_lookup(_worker_cache, key)
+        except sqlite3.OperationalError:
+            pass # E.g. the database is locked. Treated as a cache miss.
+
+    cached = graph is not None
+
+    if not cached:
+        try:
+            graph = cg.codegraph(code, lang = "java", syntax_error = "raise")
+        except Exception as e:
+            print(e)
+            return None
+
+    end_time = time() - start_time
+
+    cache_entry = None
+    if _worker_cache is not None and not cached:
+        cache_entry = (key, pickle.dumps(graph))
+
+    return [length, len(graph), end_time], cache_entry
+
+
 def main():
+    global _worker_cache
+
     parser = argparse.ArgumentParser()
     parser.add_argument("input_dir")
     parser.add_argument("result_file")
+    parser.add_argument("--cache_file", help = "SQLite file to cache graphs across runs (run times then include cache lookups)")
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1)
     args = parser.parse_args()
 
     if os.path.isfile(args.input_dir):
@@ -36,23 +124,37 @@ def main():
         files = glob(os.path.join(args.input_dir, "*.jsonl"))
 
     run_times = open(args.result_file, "w")
+    cache     = open_cache(args.cache_file) if args.cache_file else None
 
-    for example in load_examples(files):
-        tokens = example["tokens"]
-        length = len(tokens)
-        code   = tokens_to_text(tokens)
+    if args.workers > 1:
+        pool    = Pool(args.workers, initializer = init_worker, initargs = (args.cache_file,))
+        map_fn  = lambda batch: pool.imap_unordered(process_example, batch, chunksize = 16)
+    else:
+        pool, map_fn  = None, lambda batch: map(process_example, batch)
+        _worker_cache = cache
 
-        start_time = time()
+    # Examples are handed out in batches such that the input is not read ahead completely
+    batch_size = 256 * max(1, args.workers)
 
-        try:
-            graph = cg.codegraph(code, lang = "java", syntax_error = "raise")
-        except Exception as e:
-            print(e)
-            continue
+    try:
+        for batch in batched(load_examples(files), batch_size):
+            for result in map_fn(batch):
+                if result is None: continue
+                run_time, cache_entry = result
+
+                if cache_entry is not None: cache_store(cache, *cache_entry)
+
+                run_times.write(json.dumps(run_time) + "\n")
+
+            if cache is not None: cache.commit()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-        end_time = time() - start_time
-        
-        run_times.write(json.dumps([length, len(graph), end_time]) + "\n")
+        if cache is not None:
+            cache.commit()
+            cache.close()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,8 +1,16 @@
+import os
 from setuptools import setup
 
 with open("README.md", "r") as f:
     long_description = f.read()
 
+# Optional: Compile the graph core and the flow merges with mypyc (CODE_GRAPH_USE_MYPYC=1)
+# The pure Python modules stay the fallback if the extensions are not built.
+ext_modules = []
+if os.environ.get("CODE_GRAPH_USE_MYPYC", "0") == "1":
+    from mypyc.build import mypycify
+    ext_modules = mypycify(["--ignore-missing-imports", "code_graph/graph.py", "code_graph/flows.py"])
+
 setup(
   name = 'code_graph',
   packages = ['code_graph'], 
@@ -16,6 +24,7 @@ setup(
   url = 'https://github.com/cedricrupb/code_graph',  
   download_url = '', 
   keywords = ['code', 'graph', 'program', 'language processing'], 
+  ext_modules = ext_modules,
   install_requires=[          
           'tree_sitter',
           'GitPython',
@@ -0,0 +1,58 @@
+import unittest
+
+from code_graph.ast import ASTRelationVisitor
+from code_graph.graph import EDGE_CHILD, EDGE_SIBLING
+
+
+class UnhashableNode:
+    # Mimics tree-sitter nodes of versions without a node hash (before 0.20.4)
+    __hash__ = None
+
+    def __init__(self, type, children = ()):
+        self.type     = type
+        self.children = list(children)
+        self.prev_sibling = None
+
+        prev_child = None
+        for child in self.children:
+            child.prev_sibling = prev_child
+            prev_child = child
+
+
+class RecordingGraph:
+
+    def __init__(self):
+        self.relations = []
+
+    def is_token(self, ast_node):
+        return len(ast_node.children) == 0
+
+    def add_relation(self, source_node, target_node, relation, no_create = False):
+        self.relations.append((source_node.type, target_node.type, relation))
+
+
+class ASTRelationTest(unittest.TestCase):
+
+    def test_unhashable_nodes(self):
+        tree = UnhashableNode("module", [
+            UnhashableNode("a", [UnhashableNode("a1"), UnhashableNode("a2")]),
+            UnhashableNode("ERROR", [UnhashableNode("e1"), UnhashableNode("e2")]),
+            UnhashableNode("b"),
+        ])
+        graph = RecordingGraph()
+
+        ASTRelationVisitor(graph)(tree)
+
+        self.assertEqual(graph.relations, [
+            ("module", "a", EDGE_CHILD),
+            ("module", "ERROR", EDGE_CHILD),
+            ("module", "b", EDGE_CHILD),
+            ("a", "a1", EDGE_CHILD),
+            ("a", "a2", EDGE_CHILD),
+            ("a1", "a2", EDGE_SIBLING),
+            ("ERROR", "b", EDGE_SIBLING),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
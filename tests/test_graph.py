@@ -0,0 +1,107 @@
+import unittest
+from unittest import mock
+
+import code_graph as cg
+from code_graph import graph as graph_module
+
+
+PYTHON_CODE = """
+def f(x):
+    y = x + 1
+    for i in range(y):
+        if i > 2:
+            return i
+    return x
+"""
+
+HAS_NUMPY   = graph_module._try_import_numpy() is not None
+
+# The graph core is compiled with mypyc if CODE_GRAPH_USE_MYPYC=1 (see setup.py)
+IS_COMPILED = not graph_module.__file__.endswith(".py")
+
+
+def successor_edges(graph):
+    return sorted(
+        (source._graph_idx, target._graph_idx, edge_type)
+        for source in graph for _, edge_type, target in source.successors()
+    )
+
+
+def edge_signature(graph):
+    return sorted(
+        (source.node_name(), edge_type, target.node_name())
+        for source in graph for _, edge_type, target in source.successors()
+    )
+
+
+class EdgeExportTest(unittest.TestCase):
+
+    def graphs(self):
+        graph = cg.codegraph(PYTHON_CODE, lang = "python")
+        return [
+            graph,
+            graph.tokens_only(),
+            cg.codegraph("pass", lang = "python").tokens_only(), # A single node without edges
+            graph_module.CodeGraph(),
+        ]
+
+    def test_edge_arrays(self):
+        for graph in self.graphs():
+            sources, targets, edge_types, edge_type_names = graph.edge_arrays()
+
+            self.assertEqual(len(sources), len(targets))
+            self.assertEqual(len(sources), len(edge_types))
+            self.assertEqual(list(sources), sorted(sources))
+
+            edges = sorted(
+                (source_idx, target_idx, edge_type_names[type_id])
+                for source_idx, target_idx, type_id in zip(sources, targets, edge_types)
+            )
+            self.assertEqual(edges, successor_edges(graph))
+
+    def test_freeze(self):
+        for graph in self.graphs():
+            csr = graph.freeze()
+
+            self.assertEqual(len(csr.offsets), len(graph) + 1)
+            self.assertEqual(csr.offsets[-1], len(csr.neighbors))
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    def test_to_csr(self):
+        for graph in self.graphs():
+            indptr, indices, edge_types, edge_type_names = graph.to_csr()
+
+            self.assertEqual(len(indptr), len(graph) + 1)
+            self.assertEqual(indptr[-1], len(indices))
+            self.assertEqual(len(edge_types), len(indices))
+
+            edges = sorted(
+                (source_idx, int(indices[i]), edge_type_names[edge_types[i]])
+                for source_idx in range(len(graph))
+                for i in range(indptr[source_idx], indptr[source_idx + 1])
+            )
+            self.assertEqual(edges, successor_edges(graph))
+
+
+class TokensOnlyTest(unittest.TestCase):
+
+    @unittest.skipUnless(HAS_NUMPY, "requires numpy")
+    @unittest.skipIf(IS_COMPILED, "compiled modules cannot be patched")
+    def test_without_numpy(self):
+        # The edge filter of tokens_only is vectorized if numpy is available
+        graph = cg.codegraph(PYTHON_CODE, lang = "python")
+
+        expected = graph.tokens_only()
+        with mock.patch.object(graph_module, "_try_import_numpy", return_value = None), \
+             mock.patch.object(graph_module, "_token_edges", wraps = graph_module._token_edges) as token_edges:
+            tokens_only = graph.tokens_only()
+
+        self.assertTrue(token_edges.called)
+
+        self.assertEqual(len(tokens_only), len(expected))
+        self.assertEqual(successor_edges(tokens_only), successor_edges(expected))
+        self.assertEqual(edge_signature(tokens_only), edge_signature(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
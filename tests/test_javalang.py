@@ -0,0 +1,30 @@
+import logging
+import unittest
+
+import code_graph as cg
+
+
+class JavaPreprocessTest(unittest.TestCase):
+
+    def test_wraps_compilation_unit_with_syntax_error(self):
+        # A compilation unit with syntax errors is retried wrapped into a class.
+        # Then, the root is the program of the wrapped code (no method to stop at).
+        code = "public class A extends { }"
+
+        logging.disable(logging.WARNING)
+        try:
+            graph = cg.codegraph(code, lang = "java", syntax_error = "warn", analyses = ["ast", "cfg"])
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(graph.root_node.node_name(), "program")
+        self.assertEqual([token.text for token in graph.tokens], ["public", "class", "A", "extends", "{", "}"])
+
+    def test_compilation_unit(self):
+        graph = cg.codegraph("public class A { void f() { int x = 1; } }", lang = "java")
+
+        self.assertEqual(graph.root_node.node_name(), "class_declaration")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import pickle
+import unittest
+
+import code_graph as cg
+from code_graph import graph as graph_module
+
+
+# The graph core is compiled with mypyc if CODE_GRAPH_USE_MYPYC=1 (see setup.py)
+IS_COMPILED = not graph_module.__file__.endswith(".py")
+
+
+PYTHON_CODE = """
+def f(x):
+    y = x + 1
+    if y > 2:
+        return y
+    return x
+"""
+
+
+def edge_signature(graph):
+    return sorted(
+        (source.node_name(), edge_type, target.node_name())
+        for source in graph for _, edge_type, target in source.successors()
+    )
+
+
+class PickleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = cg.codegraph(PYTHON_CODE, lang = "python")
+
+    def test_roundtrip(self):
+        graph = pickle.loads(pickle.dumps(self.graph))
+
+        self.assertEqual(len(graph), len(self.graph))
+        self.assertEqual(edge_signature(graph), edge_signature(self.graph))
+
+    def test_tokens_only_after_roundtrip(self):
+        graph = pickle.loads(pickle.dumps(self.graph))
+
+        expected = self.graph.tokens_only()
+        tokens_only = graph.tokens_only()
+
+        self.assertEqual(len(tokens_only), len(expected))
+        self.assertEqual(edge_signature(tokens_only), edge_signature(expected))
+
+    def test_empty_graph(self):
+        graph = pickle.loads(pickle.dumps(graph_module.CodeGraph()))
+
+        self.assertEqual(len(graph), 0)
+        self.assertIsNone(graph.root_node)
+        self.assertEqual(len(graph.tokens_only()), 0)
+
+    @unittest.skipUnless(IS_COMPILED, "graph core is not compiled")
+    def test_roundtrip_compiled(self):
+        graph = pickle.loads(pickle.dumps(self.graph))
+
+        self.assertIs(type(graph), type(self.graph))
+        self.assertIs(type(graph.root_node), type(self.graph.root_node))
+        self.assertEqual(edge_signature(graph), edge_signature(self.graph))
+
+    def test_codegraph_many(self):
+        # Graphs are pickled to be sent back from the worker processes
+        graphs = cg.codegraph_many([PYTHON_CODE, "x = 1"], lang = "python", workers = 2)
+
+        self.assertEqual(edge_signature(graphs[0]), edge_signature(self.graph))
+
+
+if __name__ == "__main__":
+    unittest.main()